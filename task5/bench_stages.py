@@ -0,0 +1,200 @@
+import json
+import os
+import subprocess
+import sys
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pytest
+import charts
+import helper_func
+import report
+import rolling
+import rollups
+
+# pytest-benchmark suite for the task5 analytics path. Named bench_* so a
+# plain pytest run skips it; run it through benchmark.py, or directly with
+# pytest bench_stages.py [--benchmark-...].
+
+SEED = 1
+# (rows, mines, outlier density) grid for the stage timings
+CASES = [
+    (365, 10, 0.01),
+    (365, 100, 0.01),
+    (3650, 10, 0.01),
+    (3650, 10, 0.05),
+    (20000, 5, 0.01),
+]
+QUICK_CASES = [(365, 10, 0.01), (3650, 10, 0.05)]
+# TASK5_BENCH_QUICK=1 limits the stage timings to QUICK_CASES
+ACTIVE_CASES = QUICK_CASES if os.environ.get("TASK5_BENCH_QUICK") else CASES
+STAGES = ["stats", "rollup_weekly", "detector_iqr", "detector_zscore", "detector_moving_avg", "detector_grubbs",
+          "rolling_median", "rolling_mad", "figure_build", "figure_json", "pdf_build"]
+PDF_MAX_MINES = 10
+STARTUP_RUNS = 5
+# Modules main.py must not pull in before the first request
+DEFERRED_MODULES = ["scipy", "matplotlib", "reportlab", "gspread", "oauth2client", "plotly.express"]
+STARTUP_SCRIPT = """
+import sys, time, json
+start_time = time.perf_counter()
+import main
+app = main.create_app()
+elapsed = time.perf_counter() - start_time
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def make_frame(n_rows, n_cols, rng, density=0.01):
+    data = rng.normal(100, 15, size=(n_rows, n_cols))
+    spikes = rng.random((n_rows, n_cols)) < density
+    data[spikes] *= 3
+    df = pd.DataFrame(np.round(data, 2), columns=[f"Mine {i}" for i in range(n_cols)])
+    df.insert(0, "Date", pd.date_range("2020-01-01", periods=n_rows))
+    return df
+
+
+@lru_cache(maxsize=None)
+def case_data(n_rows, n_cols, density):
+    df = make_frame(n_rows, n_cols, np.random.default_rng(SEED), density)
+    return df, helper_func.compute_stats(df)
+
+
+def case_id(case):
+    n_rows, n_cols, density = case
+    return f"{n_rows}x{n_cols}-{density:.0%}"
+
+
+def build_figure_loop(df_plot, stats_data, outlier_type):
+    # Pre-batching update_chart: one scatter trace per outlier point
+    numeric_cols = df_plot.columns[1:]
+    fig = px.line(df_plot, x='Date', y=numeric_cols, title="Mine Outputs Over Time")
+    spike_legend_added = False
+    drop_legend_added = False
+    for col in numeric_cols:
+        outlier_vals = stats_data[col][f"{outlier_type}_Outliers"]
+        mask = pd.Series(outlier_vals, index=df_plot.index, dtype=bool)
+        for i, is_outlier in enumerate(mask):
+            if is_outlier:
+                y_val = df_plot[col][i]
+                if y_val > df_plot[col].median():
+                    fig.add_scatter(x=[df_plot['Date'][i]], y=[y_val],
+                                    mode='markers', marker=dict(color='green', size=10),
+                                    name='Spike', showlegend=not spike_legend_added)
+                    spike_legend_added = True
+                else:
+                    fig.add_scatter(x=[df_plot['Date'][i]], y=[y_val],
+                                    mode='markers', marker=dict(color='red', size=10),
+                                    name='Drop', showlegend=not drop_legend_added)
+                    drop_legend_added = True
+    return fig
+
+
+def build_figure_batched(df_plot, stats_data, outlier_type):
+    fig = px.line(df_plot, x='Date', y=df_plot.columns[1:], title="Mine Outputs Over Time")
+    return charts.add_outlier_markers(fig, df_plot, df_plot.columns[1:], stats_data, outlier_type)
+
+
+def each_column(detector):
+    def run(df):
+        return [detector(df[col].dropna()) for col in df.columns[1:]]
+    return run
+
+
+def build_pdf_cold(df, stats_data):
+    # Cold cache, rendered in-process so the number is comparable across hosts
+    report._chart_cache.clear()
+    report._pdf_cache.clear()
+    workers = report.REPORT_WORKERS
+    report.REPORT_WORKERS = 1
+    try:
+        return report.build_pdf(df, stats_data, "line", 1, "IQR")
+    finally:
+        report.REPORT_WORKERS = workers
+
+
+def stages(df, stats_data):
+    # name -> callable; every stage of the update_stats / update_chart / PDF path
+    pdf_df = df[df.columns[:PDF_MAX_MINES + 1]]
+    pdf_stats = {mine: stats_data[mine] for mine in pdf_df.columns[1:]}
+    return {
+        "stats": lambda: helper_func.compute_stats(df),
+        "rollup_weekly": lambda: rollups.build_rollup(df, rollups.RESOLUTIONS["weekly"]),
+        "detector_iqr": lambda: each_column(helper_func.detect_iqr_outliers)(df),
+        "detector_zscore": lambda: each_column(helper_func.detect_zscore_outliers)(df),
+        "detector_moving_avg": lambda: each_column(helper_func.detect_moving_avg_deviation)(df),
+        "detector_grubbs": lambda: each_column(helper_func.grubbs_test)(df),
+        "rolling_median": lambda: rolling.rolling_outliers(df, window=21, kind="median", center=True),
+        "rolling_mad": lambda: rolling.rolling_outliers(df, window=21, threshold=3.5, center=True, scale="mad"),
+        "figure_build": lambda: charts.build_figure(df, stats_data, "line", 1, "IQR", max_points=1200),
+        "figure_json": lambda: charts.build_figure(df, stats_data, "line", 1, "IQR", max_points=1200).to_json(),
+        "pdf_build": lambda: build_pdf_cold(pdf_df, pdf_stats),
+    }
+
+
+@pytest.mark.parametrize("case", ACTIVE_CASES, ids=case_id)
+@pytest.mark.parametrize("stage", STAGES)
+def test_stage(benchmark, stage, case):
+    df, stats_data = case_data(*case)
+    func = stages(df, stats_data)[stage]
+    benchmark.group = case_id(case)
+    if stage == "pdf_build":
+        output = benchmark.pedantic(func, rounds=1, iterations=1)
+    else:
+        output = benchmark(func)
+    if stage in ("figure_json", "pdf_build"):
+        benchmark.extra_info["bytes"] = len(output)
+
+
+@pytest.mark.parametrize("n_cols", [10, 100, 1000])
+@pytest.mark.parametrize("impl", ["loop", "vectorized"])
+def test_reference_stats(benchmark, impl, n_cols):
+    # Per-mine loop vs the vectorized path; both must give identical stats
+    df = make_frame(365, n_cols, np.random.default_rng(SEED))
+    benchmark.group = f"reference stats, {n_cols} mines x 365 rows"
+    if impl == "loop":
+        result = benchmark.pedantic(helper_func.compute_stats_loop, args=(df,), rounds=1, iterations=1)
+    else:
+        result = benchmark(helper_func.compute_stats, df)
+    assert result == helper_func.compute_stats(df)
+
+
+@pytest.mark.parametrize("builder", [build_figure_loop, build_figure_batched], ids=["per_point", "batched"])
+def test_reference_figure(benchmark, builder):
+    df = make_frame(365, 10, np.random.default_rng(SEED))
+    stats_data = helper_func.compute_stats(df, iqr_mult=0.5)
+    benchmark.group = "reference figure, 10 mines x 365 rows"
+    size = benchmark.pedantic(lambda: len(builder(df, stats_data, "IQR").to_json()), rounds=3, iterations=1)
+    benchmark.extra_info["bytes"] = size
+
+
+@pytest.mark.parametrize("mode", ["none", "lttb", "minmax"])
+def test_reference_downsampling(benchmark, mode):
+    df, stats_data = case_data(50000, 5, 0.01)
+    benchmark.group = "reference downsampling, 5 mines x 50000 rows"
+    size = benchmark.pedantic(lambda: len(charts.build_figure(df, stats_data, "line", 1, "IQR", max_points=1200,
+                                                              downsample=mode).to_json()), rounds=3, iterations=1)
+    benchmark.extra_info["bytes"] = size
+
+
+def test_startup(benchmark):
+    # Cold start of a worker: fresh interpreter, import main, build the app.
+    # TASK5_STARTUP_BUDGET=seconds fails the test if the median is over it.
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, PYTHONPATH=here + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    runs = []
+
+    def start():
+        out = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT % DEFERRED_MODULES], cwd=here, env=env,
+                             capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    benchmark.group = "startup"
+    benchmark.pedantic(start, rounds=STARTUP_RUNS, iterations=1)
+    times = sorted(run["seconds"] for run in runs)
+    median = times[len(times) // 2]
+    benchmark.extra_info["import_and_build_median"] = median
+    assert sorted({m for run in runs for m in run["loaded"]}) == []
+    budget = os.environ.get("TASK5_STARTUP_BUDGET")
+    if budget:
+        assert median <= float(budget)
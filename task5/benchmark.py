@@ -0,0 +1,47 @@
+import argparse
+import os
+import sys
+import pytest
+
+# Runner for the pytest-benchmark suite in bench_stages.py. Arguments it does
+# not know are passed on to pytest, e.g. --benchmark-min-rounds=10.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the task5 mines analytics path")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--save", metavar="NAME", help="store this run under .benchmarks for later --baseline")
+    parser.add_argument("--baseline", metavar="NUM|ID", help="stored run to compare against (see --save)")
+    parser.add_argument("--profile", help="directory for a cProfile dump per case and stage")
+    parser.add_argument("--quick", action="store_true", help="run the two smallest cases only")
+    parser.add_argument("--reference", action="store_true",
+                        help="compare against the pre-optimisation implementations instead")
+    parser.add_argument("--startup", action="store_true",
+                        help="time importing main and building the app in a fresh interpreter")
+    parser.add_argument("--startup-budget", type=float,
+                        help="with --startup, fail if the median exceeds this many seconds")
+    args, pytest_args = parser.parse_known_args()
+
+    selection = "test_startup" if args.startup else "test_reference" if args.reference else "test_stage"
+    pytest_args = [os.path.join(HERE, "bench_stages.py"), "-k", selection, "-q"] + pytest_args
+    if args.output:
+        pytest_args.append(f"--benchmark-json={args.output}")
+    if args.save:
+        pytest_args.append(f"--benchmark-save={args.save}")
+    if args.baseline:
+        pytest_args.append(f"--benchmark-compare={args.baseline}")
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+        pytest_args += ["--benchmark-cprofile=cumtime",
+                        f"--benchmark-cprofile-dump={os.path.join(args.profile, 'stage')}"]
+    if args.quick:
+        os.environ["TASK5_BENCH_QUICK"] = "1"
+    if args.startup_budget is not None:
+        os.environ["TASK5_STARTUP_BUDGET"] = str(args.startup_budget)
+    return pytest.main(pytest_args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+from downsample import downsample_indices
+import trendline
+
+
+def outlier_mask(values, outlier_vals):
+    # Stats masks cover the column after dropna(); map them back onto the frame rows
+    mask = np.zeros(len(values), dtype=bool)
+    outlier_vals = np.asarray(outlier_vals)
+    if len(outlier_vals) == 0:
+        return mask
+    if outlier_vals.dtype == bool:
+        if len(outlier_vals) == len(values):
+            return outlier_vals.copy()
+        mask[~np.isnan(values)] = outlier_vals
+    else:
+        mask[outlier_vals] = True
+    return mask
+
+
+def split_outliers(values, outlier_vals):
+    # Spike/drop split against the column median, one boolean selection each
+    mask = outlier_mask(values, outlier_vals)
+    above = values > np.nanmedian(values)
+    return mask & above, mask & ~above
+
+
+def add_outlier_markers(fig, df_plot, numeric_cols, stats_data, outlier_type):
+    # At most one Spike and one Drop trace per mine, sharing two legend entries
+    dates = df_plot['Date'].to_numpy()
+    legend_added = set()
+    for col in numeric_cols:
+        outlier_vals = stats_data.get(col, {}).get(f"{outlier_type}_Outliers", [])
+        if len(outlier_vals) == 0:
+            continue
+        values = df_plot[col].to_numpy(dtype=float)
+        spikes, drops = split_outliers(values, outlier_vals)
+        for name, color, sel in (('Spike', 'green', spikes), ('Drop', 'red', drops)):
+            if not sel.any():
+                continue
+            fig.add_scatter(x=dates[sel], y=values[sel], mode='markers',
+                            marker=dict(color=color, size=10), name=name,
+                            legendgroup=name, showlegend=name not in legend_added)
+            legend_added.add(name)
+    return fig
+
+
+def downsampled_lines(df_plot, numeric_cols, max_points, mode, stats_data, outlier_type):
+    # Long-format frame with each mine reduced to about max_points rows; rows
+    # flagged by the selected outlier type are always kept
+    dates = df_plot['Date'].to_numpy()
+    x = dates.astype('datetime64[ns]').astype(np.int64)
+    parts = []
+    for col in numeric_cols:
+        values = df_plot[col].to_numpy(dtype=float)
+        keep = None
+        if outlier_type != 'none' and stats_data is not None:
+            keep = outlier_mask(values, stats_data.get(col, {}).get(f"{outlier_type}_Outliers", []))
+        idx = downsample_indices(x, values, max_points, mode, keep)
+        parts.append(pd.DataFrame({'Date': dates[idx], 'variable': col, 'value': values[idx]}))
+    return pd.concat(parts, ignore_index=True)
+
+
+def build_figure(df_plot, stats_data, chart_type, trendline_degree, outlier_type,
+                 max_points=None, downsample='lttb', version=None):
+    numeric_cols = df_plot.columns[1:]
+    n = len(df_plot)
+    reduce = bool(max_points) and downsample != 'none' and n > max_points
+    if chart_type == 'line':
+        if reduce:
+            lines = downsampled_lines(df_plot, numeric_cols, max_points, downsample, stats_data, outlier_type)
+            fig = px.line(lines, x='Date', y='value', color='variable', title="Mine Outputs Over Time")
+            # The trendline is smooth, so evenly spaced samples are enough
+            trend_x = np.unique(np.linspace(0, n - 1, max_points).astype(int))
+        else:
+            fig = px.line(df_plot, x='Date', y=numeric_cols, title="Mine Outputs Over Time")
+            trend_x = np.arange(n)
+        trends = trendline.trend_values(df_plot, trendline_degree, trend_x, version)
+        trend_dates = df_plot['Date'].to_numpy()[trend_x]
+        for col in numeric_cols:
+            fig.add_scatter(x=trend_dates, y=trends[col],
+                            mode='lines', line=dict(dash='dash'), name=f"{col} Trendline")
+    elif chart_type == 'histogram':
+        fig = px.histogram(df_plot.melt(id_vars='Date', value_vars=numeric_cols),
+                           x='value', color='variable', barmode='overlay',
+                           title="Histogram of Mine Outputs")
+    elif chart_type == 'violin':
+        fig = px.violin(df_plot.melt(id_vars='Date', value_vars=numeric_cols),
+                        x='variable', y='value', box=True, points='all',
+                        title="Violin Plot of Mine Outputs")
+    elif chart_type == 'bar':
+        fig = px.bar(df_plot, x='Date', y=numeric_cols, title="Mine Outputs Over Time")
+    elif chart_type == 'stacked':
+        fig = px.bar(df_plot, x='Date', y=numeric_cols, barmode='stack', title="Mine Outputs Over Time")
+    else:
+        fig = px.line(df_plot, x='Date', y=numeric_cols, title="Mine Outputs Over Time")
+
+    if outlier_type != 'none' and stats_data is not None and chart_type == 'line':
+        add_outlier_markers(fig, df_plot, numeric_cols, stats_data, outlier_type)
+
+    return fig
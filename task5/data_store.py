@@ -0,0 +1,59 @@
+import os
+import threading
+from collections import OrderedDict
+import pandas as pd
+from stats_cache import frame_key
+
+
+class DataStore:
+    """Versioned, process-local store of mine frames.
+
+    Callbacks pass around the version token returned by put() instead of the
+    records themselves. With a directory set, every version is also written
+    as Parquet so other workers on the same host can load it by token.
+    """
+
+    def __init__(self, max_versions=8, directory=None):
+        self.max_versions = max_versions
+        self.directory = directory
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, token):
+        return os.path.join(self.directory, f"{token}.parquet")
+
+    def _remember(self, token, df):
+        self._frames[token] = df
+        self._frames.move_to_end(token)
+        if len(self._frames) > self.max_versions:
+            self._frames.popitem(last=False)
+
+    def put(self, df):
+        # Content-addressed: identical data maps to the same token, which
+        # also serves as the stats_cache key
+        token = frame_key(df)
+        with self._lock:
+            self._remember(token, df)
+        if self.directory and not os.path.exists(self._path(token)):
+            tmp_path = self._path(token) + ".tmp"
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self._path(token))
+        return token
+
+    def get(self, token):
+        with self._lock:
+            df = self._frames.get(token)
+            if df is not None:
+                self._frames.move_to_end(token)
+                return df
+        if self.directory and os.path.exists(self._path(token)):
+            df = pd.read_parquet(self._path(token))
+            with self._lock:
+                self._remember(token, df)
+            return df
+        return None
+
+
+data_store = DataStore(directory=os.environ.get("TASK5_DATA_DIR"))
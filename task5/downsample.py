@@ -0,0 +1,63 @@
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    # Largest-Triangle-Three-Buckets: keeps the first and last point and, per
+    # bucket, the point spanning the largest triangle with the previously kept
+    # point and the next bucket's average
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < len(edges):
+            next_bucket = y[end:edges[i + 2]]
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = y[a] if np.isnan(next_bucket).all() else np.nanmean(next_bucket)
+        else:
+            next_x, next_y = x[n - 1], y[n - 1]
+        area = np.abs((x[a] - next_x) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (next_y - y[a]))
+        area = np.where(np.isnan(area), -1.0, area)
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_out):
+    # Min and max of each of n_out // 2 equal buckets, plus both end points
+    n = len(y)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return np.arange(n)
+    y = np.asarray(y, dtype=float)
+    size = -(-n // buckets)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = y
+    blocks = padded.reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    lows = offsets + np.argmin(np.where(np.isnan(blocks), np.inf, blocks), axis=1)
+    highs = offsets + np.argmax(np.where(np.isnan(blocks), -np.inf, blocks), axis=1)
+    idx = np.concatenate([[0, n - 1], lows, highs])
+    return np.unique(idx[idx < n])
+
+
+def downsample_indices(x, y, n_out, mode='lttb', keep=None):
+    """Row positions to plot for one series. Points flagged in keep (e.g.
+    outliers) are always included so markers stay on the line."""
+    if mode == 'minmax':
+        idx = minmax_indices(y, n_out)
+    elif mode == 'lttb':
+        idx = lttb_indices(x, y, n_out)
+    else:
+        idx = np.arange(len(y))
+    if keep is not None and keep.any():
+        idx = np.union1d(idx, np.flatnonzero(keep))
+    return idx
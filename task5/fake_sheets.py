@@ -0,0 +1,62 @@
+import csv
+
+
+class FakeWorksheet:
+    """In-memory stand-in for gspread.Worksheet covering what SheetSync uses.
+
+    Like a real sheet, row_count is the grid size (1000 rows by default),
+    not the number of filled rows.
+    """
+
+    def __init__(self, values, rows=1000):
+        self.values = [list(map(str, row)) for row in values]
+        self.rows = rows
+        self.reads = []
+
+    @property
+    def row_count(self):
+        return max(self.rows, len(self.values))
+
+    def col_values(self, col):
+        self.reads.append(f"col {col}")
+        column = [row[col - 1] if col <= len(row) else "" for row in self.values]
+        # gspread drops trailing empty cells
+        while column and not column[-1]:
+            column.pop()
+        return column
+
+    def row_values(self, row):
+        self.reads.append(f"{row}:{row}")
+        return list(self.values[row - 1]) if row <= len(self.values) else []
+
+    def get_values(self, range_name=None):
+        self.reads.append(range_name)
+        if range_name is None:
+            return [list(row) for row in self.values]
+        start, end = (int(part) for part in range_name.split(":"))
+        return [list(row) for row in self.values[start - 1:end]]
+
+    def append_row(self, row):
+        self.values.append(list(map(str, row)))
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets):
+        self.worksheets = worksheets
+
+    def worksheet(self, name):
+        return self.worksheets[name]
+
+
+class FakeClient:
+    def __init__(self, spreadsheets):
+        self.spreadsheets = spreadsheets
+
+    def open(self, name):
+        return self.spreadsheets[name]
+
+    @classmethod
+    def from_csv(cls, path, sheet_name="task5_gs", worksheet_name="Data"):
+        with open(path, newline="") as f:
+            values = list(csv.reader(f))
+        return cls({sheet_name: FakeSpreadsheet({worksheet_name: FakeWorksheet(values)})})
@@ -1,9 +1,17 @@
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from scipy import stats
+from functools import lru_cache
+import rolling
 
+# Rolling blocks / Grubbs mask sets kept per base; each rolling block is as
+# large as the data, so only the most recently used few are kept
+MEMO_SIZE = 4
 
-def compute_stats(df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grubbs_alpha=0.05):
+
+def compute_stats_loop(df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grubbs_alpha=0.05):
+    # Reference per-mine implementation, kept for parity checks and benchmark.py
     numeric_cols = df.columns[1:]
     outlier_data = {}
 
@@ -22,7 +30,7 @@ def compute_stats(df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grub
         iqr_out = detect_iqr_outliers(series, multiplier=iqr_mult)
         z_out = detect_zscore_outliers(series, threshold=z_thresh)
         ma_out = detect_moving_avg_deviation(series, window=ma_window, percent_threshold=ma_percent)
-        grubbs_out = grubbs_test(series, alpha=grubbs_alpha)
+        grubbs_out = grubbs_test_loop(series, alpha=grubbs_alpha)
 
         # Store all stats and outliers
         outlier_data[mine] = {
@@ -44,6 +52,150 @@ def compute_stats(df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grub
     return outlier_data
 
 
+def column_block(df, cols):
+    # (n_cols, n_rows) float block; NaNs are moved to the end of each row so that
+    # row j holds exactly df[cols[j]].dropna() followed by padding
+    values = df[cols].to_numpy(dtype=float).T
+    nan_mask = np.isnan(values)
+    counts = values.shape[1] - nan_mask.sum(axis=1)
+    if nan_mask.any():
+        order = np.argsort(nan_mask, axis=1, kind='stable')
+        values = np.take_along_axis(values, order, axis=1)
+    return np.ascontiguousarray(values), counts
+
+
+def compute_base(df):
+    # Everything that depends only on the data, computed for all columns at once
+    cols = list(df.columns[1:])
+    values, counts = column_block(df, cols)
+    valid = np.arange(values.shape[1]) < counts[:, None]
+    has_nan = not valid.all()
+
+    filled = np.where(valid, values, 0.0) if has_nan else values
+    total = filled.sum(axis=1)
+    # Padding changes the pairwise summation blocks, so columns with gaps are
+    # re-summed over their valid prefix to stay bit-identical with pandas
+    partial = np.flatnonzero(counts < values.shape[1])
+    for j in partial:
+        total[j] = values[j, :counts[j]].sum()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / counts
+        centered = np.where(valid, values - mean[:, None], 0.0)
+        sq = (centered * centered).sum(axis=1)
+        for j in partial:
+            sq[j] = (centered[j, :counts[j]] * centered[j, :counts[j]]).sum()
+        std = np.sqrt(sq / (counts - 1))
+        std0 = np.sqrt(sq / counts)
+    if has_nan:
+        median = np.nanmedian(values, axis=1)
+        q1, q3 = np.nanpercentile(values, [25, 75], axis=1)
+    elif values.size:
+        median = np.median(values, axis=1)
+        q1, q3 = np.percentile(values, [25, 75], axis=1)
+    else:
+        # No mines (or no rows) yet, e.g. before the first sheet sync
+        median = q1 = q3 = np.full(len(cols), np.nan)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        abs_z = np.abs((values - mean[:, None]) / std0[:, None])
+
+    # Integer columns keep their integer totals, as Series.sum() returns them
+    int_totals = df[cols].select_dtypes('integer').sum()
+    total = [int_totals[c] if c in int_totals.index else total[j] for j, c in enumerate(cols)]
+    return {
+        "cols": cols,
+        "values": values,
+        "counts": counts,
+        "valid": valid,
+        "mean": mean,
+        "std": std,
+        "median": median,
+        "q1": q1,
+        "q3": q3,
+        "total": total,
+        "abs_z": abs_z,
+        # Per-window rolling means and per-alpha Grubbs masks, filled on demand
+        "memo": OrderedDict(),
+        "memo_lock": threading.Lock(),
+    }
+
+
+def memoized(base, key, compute):
+    # LRU lookup in base["memo"]; compute() runs outside the lock, so a slow
+    # Grubbs pass does not hold up other callers of the same base
+    memo = base["memo"]
+    with base["memo_lock"]:
+        value = memo.get(key)
+        if value is not None:
+            memo.move_to_end(key)
+            return value
+    value = compute()
+    with base["memo_lock"]:
+        memo[key] = value
+        memo.move_to_end(key)
+        while len(memo) > MEMO_SIZE:
+            memo.popitem(last=False)
+    return value
+
+
+def rolling_mean_block(base, window):
+    # One rolling pass over the whole block; the padding after each column's
+    # valid prefix never enters a trailing window, so each row matches
+    # detect_moving_avg_deviation on the dropped column
+    return memoized(base, ("rolling", window), lambda: rolling.rolling_mean(base["values"], window))
+
+
+def grubbs_block(base, alpha):
+    def masks():
+        values = base["values"]
+        return [grubbs_test(pd.Series(values[j, :n]), alpha=alpha).to_numpy()
+                for j, n in enumerate(base["counts"])]
+    return memoized(base, ("grubbs", alpha), masks)
+
+
+def derive_stats(base, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grubbs_alpha=0.05):
+    # Threshold-dependent masks on top of compute_base
+    values = base["values"]
+    iqr = base["q3"] - base["q1"]
+    lower = (base["q1"] - iqr_mult * iqr)[:, None]
+    upper = (base["q3"] + iqr_mult * iqr)[:, None]
+    iqr_mask = (values < lower) | (values > upper)
+    z_mask = base["abs_z"] > z_thresh
+    ma = rolling_mean_block(base, ma_window)
+    ma_mask = rolling.percent_deviation(values, ma) > ma_percent
+
+    grubbs_masks = grubbs_block(base, grubbs_alpha)
+
+    outlier_data = {}
+    for j, mine in enumerate(base["cols"]):
+        n = base["counts"][j]
+        iqr_out = iqr_mask[j, :n]
+        z_out = z_mask[j, :n]
+        ma_out = ma_mask[j, :n]
+        grubbs_out = grubbs_masks[j]
+        outlier_data[mine] = {
+            "Mean": base["mean"][j],
+            "Std Dev": base["std"][j],
+            "Median": base["median"][j],
+            "IQR": iqr[j],
+            "Total": base["total"][j],
+            "IQR_Outliers": iqr_out.tolist(),
+            "Zscore_Outliers": z_out.tolist(),
+            "MA_Outliers": ma_out.tolist(),
+            "Grubbs_Outliers": grubbs_out.tolist(),
+            "IQR_Outliers_Count": int(iqr_out.sum()),
+            "Zscore_Outliers_Count": int(z_out.sum()),
+            "MA_Outliers_Count": int(ma_out.sum()),
+            "Grubbs_Outliers_Count": int(grubbs_out.sum())
+        }
+
+    return outlier_data
+
+
+def compute_stats(df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20, grubbs_alpha=0.05):
+    base = compute_base(df)
+    return derive_stats(base, iqr_mult, z_thresh, ma_window, ma_percent, grubbs_alpha)
+
 
 def detect_iqr_outliers(series, multiplier=1.5):
     s = series.dropna()
@@ -55,19 +207,25 @@ def detect_iqr_outliers(series, multiplier=1.5):
 
 
 def detect_zscore_outliers(series, threshold=3):
+    # scipy is imported on first use to keep the Dash app's startup light
+    from scipy import stats
     z = np.abs(stats.zscore(series, nan_policy='omit'))
     return z > threshold
 
 
-def detect_moving_avg_deviation(series, window=5, percent_threshold=20):
-    ma = series.rolling(window=window).mean()
-    deviation = np.abs(series - ma) / ma * 100
-    return deviation > percent_threshold
+def detect_moving_avg_deviation(series, window=5, percent_threshold=20, kind="mean", center=False):
+    # kind is "mean", "median" or "ewma"; see rolling.py for the baselines
+    baseline = rolling.rolling_baseline(series.to_numpy(dtype=float), window, kind, center)
+    deviation = rolling.percent_deviation(series.to_numpy(dtype=float), baseline)
+    return pd.Series(deviation > percent_threshold, index=series.index)
 
 
-def grubbs_test(series, alpha=0.05):
-    s = series.copy()
-    mask = pd.Series(False, index=s.index)
+def grubbs_test_loop(series, alpha=0.05):
+    # Reference drop-and-recompute implementation, kept for parity checks
+    from scipy import stats
+    # NaNs are skipped: n counts valid readings only, as in grubbs_test
+    s = series.dropna()
+    mask = pd.Series(False, index=series.index)
     while True:
         mean = s.mean()
         std = s.std()
@@ -81,8 +239,150 @@ def grubbs_test(series, alpha=0.05):
         g_crit = numerator / denominator
         if g > g_crit:
             outlier_index = np.argmax(np.abs(s - mean))
-            mask.iloc[outlier_index] = True
+            mask.loc[s.index[outlier_index]] = True
             s = s.drop(s.index[outlier_index])
         else:
             break
     return mask
+
+
+GRUBBS_CRIT_CHUNK = 64
+GRUBBS_RTOL = 1e-9
+
+
+@lru_cache(maxsize=256)
+def grubbs_critical(n_hi, n_lo, alpha):
+    # Two-sided Grubbs critical values for sample sizes n_hi down to n_lo (>= 3),
+    # from a single vectorized t.ppf call
+    from scipy import stats
+    ns = np.arange(n_hi, n_lo - 1, -1)
+    t_crit = stats.t.ppf(1 - alpha / (2 * ns), ns - 2)
+    numerator = (ns - 1) * np.sqrt(t_crit ** 2)
+    denominator = np.sqrt(ns) * np.sqrt(ns - 2 + t_crit ** 2)
+    return numerator / denominator
+
+
+def _critical_lookup(n_total, alpha):
+    # Critical value for sample size n, filled in chunks as removals go deeper
+    chunks = {}
+
+    def lookup(n):
+        offset = n_total - n
+        start = offset - offset % GRUBBS_CRIT_CHUNK
+        if start not in chunks:
+            n_hi = n_total - start
+            chunks[start] = grubbs_critical(n_hi, max(3, n_hi - GRUBBS_CRIT_CHUNK + 1), alpha)
+        return chunks[start][offset - start]
+
+    return lookup
+
+
+def _exact_step(values, removed):
+    # Same arithmetic as grubbs_test_loop on the remaining points in position order
+    positions = np.flatnonzero(~removed)
+    s = pd.Series(values[positions])
+    mean = s.mean()
+    dev = np.abs(s - mean)
+    # A constant remainder gives 0 / 0: NaN, which never beats the critical value
+    with np.errstate(invalid='ignore', divide='ignore'):
+        g = dev.max() / s.std()
+    return g, positions[int(np.argmax(dev))]
+
+
+def _grubbs_steps(values):
+    """Yield (position, g, n, removed) for successive removals of the most
+    extreme point. Sorts once and keeps running sums, so each step is O(1)."""
+    n = len(values)
+    order = np.argsort(values, kind='stable')
+    v = values[order]
+    idx = np.arange(n)
+    new_run = np.r_[True, v[1:] != v[:-1]]
+    run_start = np.maximum.accumulate(np.where(new_run, idx, 0))
+    run_end = np.minimum.accumulate(np.where(np.r_[new_run[1:], True], idx, n)[::-1])[::-1]
+    removed = np.zeros(n, dtype=bool)
+
+    def rebase(lo, hi):
+        center = v[lo:hi + 1].mean()
+        shifted = v[lo:hi + 1] - center
+        return center, shifted.sum(), (shifted * shifted).sum()
+
+    lo, hi = 0, n - 1
+    center, s1, s2 = rebase(lo, hi)
+    s2_base = s2
+    while hi - lo + 1 >= 3:
+        m = hi - lo + 1
+        mean_shift = s1 / m
+        std = np.sqrt(max(s2 - s1 * mean_shift, 0.0) / (m - 1))
+        mean = center + mean_shift
+        dev_lo = mean - v[lo]
+        dev_hi = v[hi] - mean
+        # Within a run of equal values the earliest position goes first,
+        # matching np.argmax on the position-ordered series
+        pos_lo = order[lo]
+        pos_hi = order[run_start[hi] + run_end[hi] - hi]
+        if abs(dev_lo - dev_hi) <= GRUBBS_RTOL * max(abs(dev_lo), abs(dev_hi)):
+            take_lo = pos_lo < pos_hi
+        else:
+            take_lo = dev_lo > dev_hi
+        with np.errstate(invalid='ignore', divide='ignore'):
+            g = (dev_lo if take_lo else dev_hi) / std
+        if take_lo:
+            pos, x = pos_lo, v[lo]
+            lo += 1
+        else:
+            pos, x = pos_hi, v[hi]
+            hi -= 1
+        yield pos, g, m, removed
+        removed[pos] = True
+        s1 -= x - center
+        s2 -= (x - center) ** 2
+        # Removing a heavy tail shrinks the sum of squares by orders of
+        # magnitude; re-centre before cancellation eats the precision
+        if s2 < s2_base * 1e-6 and hi >= lo:
+            center, s1, s2 = rebase(lo, hi)
+            s2_base = s2
+
+
+def grubbs_test(series, alpha=0.05):
+    values = series.to_numpy(dtype=float)
+    mask = np.zeros(len(values), dtype=bool)
+    valid = ~np.isnan(values)
+    # NaNs are skipped: n counts valid readings only, as in grubbs_test_loop
+    critical = _critical_lookup(int(valid.sum()), alpha)
+    positions = np.flatnonzero(valid)
+    steps = _grubbs_steps(values[valid])
+    for pos, g, m, removed in steps:
+        g_crit = critical(m)
+        if abs(g - g_crit) <= GRUBBS_RTOL * g_crit or not np.isfinite(g):
+            g, pos = _exact_step(values[valid], removed)
+        if not g > g_crit:
+            break
+        mask[positions[pos]] = True
+    return pd.Series(mask, index=series.index)
+
+
+def generalized_esd(series, max_outliers=None, alpha=0.05):
+    # Rosner's generalized ESD: the same removal sequence as Grubbs, but the
+    # outlier count is the last step whose statistic beats its critical value.
+    # NaNs are skipped and never flagged, as in grubbs_test.
+    values = series.to_numpy(dtype=float)
+    valid = ~np.isnan(values)
+    positions = np.flatnonzero(valid)
+    values = values[valid]
+    if max_outliers is None:
+        max_outliers = max(1, len(values) // 10)
+    critical = _critical_lookup(len(values), alpha)
+    picked = []
+    n_outliers = 0
+    for step, (pos, g, m, removed) in enumerate(_grubbs_steps(values), start=1):
+        if step > max_outliers:
+            break
+        g_crit = critical(m)
+        if abs(g - g_crit) <= GRUBBS_RTOL * g_crit or not np.isfinite(g):
+            g, pos = _exact_step(values, removed)
+        picked.append(pos)
+        if g > g_crit:
+            n_outliers = step
+    mask = np.zeros(len(series), dtype=bool)
+    mask[positions[picked[:n_outliers]]] = True
+    return pd.Series(mask, index=series.index)
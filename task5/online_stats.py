@@ -0,0 +1,173 @@
+import math
+import numpy as np
+import rolling
+
+# DDSketch-style relative accuracy of the quantile sketch: every order
+# statistic the sketch returns is within this fraction of the true sample
+# value at that rank. Quantiles interpolate between the two order statistics
+# around q*(n-1), as np.percentile does, so Median is within 0.5% of
+# max(|x_lo|, |x_hi|) of the batch median (x_lo, x_hi the neighbouring sample
+# values) and IQR within the sum of those bounds for Q1 and Q3. Mean, Std Dev
+# and Total match the batch path to float rounding (Welford/Chan merges), and
+# MA flags are exact.
+RELATIVE_ACCURACY = 0.005
+
+
+class QuantileSketch:
+    """Log-bucketed quantile sketch (DDSketch) with O(batch) updates."""
+
+    def __init__(self, relative_accuracy=RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.positive = {}
+        self.negative = {}
+        self.zeros = 0
+        self.count = 0
+
+    def _add(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self._log_gamma).astype(np.int64),
+                                 return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        self._add(self.positive, values[values > 0])
+        self._add(self.negative, -values[values < 0])
+        self.zeros += int((values == 0).sum())
+        self.count += len(values)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def _buckets(self):
+        # (value, count) in ascending order
+        for key in sorted(self.negative, reverse=True):
+            yield -self._value(key), self.negative[key]
+        if self.zeros:
+            yield 0.0, self.zeros
+        for key in sorted(self.positive):
+            yield self._value(key), self.positive[key]
+
+    def quantile(self, q):
+        if self.count == 0:
+            return np.nan
+        # np.percentile's linear rule: interpolate between the order
+        # statistics at floor(q*(n-1)) and the next rank up
+        rank = q * (self.count - 1)
+        lo_rank = math.floor(rank)
+        frac = rank - lo_rank
+        hi_rank = min(lo_rank + 1, self.count - 1)
+        lo = None
+        seen = 0
+        for value, count in self._buckets():
+            seen += count
+            if lo is None and seen > lo_rank:
+                lo = value
+            if seen > hi_rank:
+                return lo + frac * (value - lo)
+        return lo
+
+
+class OnlineMineStats:
+    """Streaming version of one mine's compute_stats metrics.
+
+    update() takes the newly appended readings and returns their IQR, Z-score
+    and moving-average flags, judged against the statistics after the batch is
+    merged in. Flags of earlier points are not revisited, so they can differ
+    from a batch recompute once later data shifts the thresholds. Grubbs is
+    iterative over the whole sample and stays batch-only.
+    """
+
+    def __init__(self, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20,
+                 relative_accuracy=RELATIVE_ACCURACY):
+        self.iqr_mult = iqr_mult
+        self.z_thresh = z_thresh
+        self.ma_window = ma_window
+        self.ma_percent = ma_percent
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        # Last ma_window - 1 readings, enough to close the next trailing window
+        self.ring = np.empty(0)
+        self.outlier_counts = {"IQR": 0, "Zscore": 0, "MA": 0}
+
+    def update(self, values):
+        # Flags line up with the input; NaN readings are skipped, as the batch
+        # path's dropna() does, and flagged False
+        values = np.asarray(values, dtype=float)
+        valid = ~np.isnan(values)
+        flags = {name: np.zeros(len(values), dtype=bool) for name in self.outlier_counts}
+        values = values[valid]
+        if len(values) == 0:
+            return flags
+
+        # Chan et al. merge of the batch's (n, mean, M2) into the running Welford state
+        n_b = len(values)
+        mean_b = values.mean()
+        m2_b = ((values - mean_b) ** 2).sum()
+        n = self.n + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.n * n_b / n
+        self.n = n
+        self.total += values.sum()
+        self.sketch.update(values)
+
+        q1, q3 = self.sketch.quantile(0.25), self.sketch.quantile(0.75)
+        iqr = q3 - q1
+        iqr_out = (values < q1 - self.iqr_mult * iqr) | (values > q3 + self.iqr_mult * iqr)
+        std0 = math.sqrt(self.m2 / self.n)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            z_out = np.abs(values - self.mean) / std0 > self.z_thresh
+
+        window = self.ma_window
+        joined = np.concatenate([self.ring, values])
+        ma = rolling.rolling_mean(joined, window)[len(self.ring):]
+        ma_out = rolling.percent_deviation(values, ma) > self.ma_percent
+        self.ring = joined[-(window - 1):] if window > 1 else np.empty(0)
+
+        for name, mask in {"IQR": iqr_out, "Zscore": z_out, "MA": ma_out}.items():
+            flags[name][valid] = mask
+            self.outlier_counts[name] += int(mask.sum())
+        return flags
+
+    def summary(self):
+        q1, q3 = self.sketch.quantile(0.25), self.sketch.quantile(0.75)
+        return {
+            "Mean": self.mean if self.n else np.nan,
+            "Std Dev": math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else np.nan,
+            "Median": self.sketch.quantile(0.5),
+            "IQR": q3 - q1,
+            "Total": self.total,
+            "IQR_Outliers_Count": self.outlier_counts["IQR"],
+            "Zscore_Outliers_Count": self.outlier_counts["Zscore"],
+            "MA_Outliers_Count": self.outlier_counts["MA"],
+        }
+
+
+class OnlineStats:
+    """One OnlineMineStats per mine column, fed with appended sheet rows."""
+
+    def __init__(self, **params):
+        self.params = params
+        self.mines = {}
+
+    def update(self, df_new):
+        flags = {}
+        for mine in df_new.columns[1:]:
+            if mine not in self.mines:
+                self.mines[mine] = OnlineMineStats(**self.params)
+            flags[mine] = self.mines[mine].update(df_new[mine].to_numpy(dtype=float))
+        return flags
+
+    def summary(self):
+        return {mine: stats.summary() for mine, stats in self.mines.items()}
+
+    @classmethod
+    def from_frame(cls, df, **params):
+        online = cls(**params)
+        online.update(df)
+        return online
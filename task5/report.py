@@ -0,0 +1,228 @@
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle, Image, Spacer, PageBreak
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+from charts import split_outliers
+import trendline
+
+REPORT_WORKERS = int(os.environ.get("TASK5_REPORT_WORKERS", os.cpu_count() or 1))
+CHART_CACHE_SIZE = 256
+PDF_CACHE_SIZE = 8
+
+_chart_cache = OrderedDict()
+_pdf_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    # Never fork: the Dash server is multithreaded and a forked child can
+    # inherit locks held by other threads. The forkserver starts from a
+    # clean process with this module preloaded; spawn is the fallback.
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _executor = ProcessPoolExecutor(max_workers=REPORT_WORKERS, mp_context=context)
+        return _executor
+
+
+def reset_executor(broken):
+    # A pool with a dead worker (OOM, kill) refuses all further work; drop
+    # it so the next get_executor() starts a fresh one
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+    broken.shutdown(wait=True, cancel_futures=True)
+
+
+def render_chart(task):
+    # Runs in a worker process; task only holds plain arrays so it pickles cheaply
+    mine = task["mine"]
+    chart_type = task["chart_type"]
+    dates = task["dates"]
+    fig, ax = plt.subplots(figsize=(12, 6))
+    if chart_type == "line":
+        for col, values, out_vals in task["series"]:
+            ax.plot(dates, values, label=col)
+            ax.plot(dates, task["trends"][col], linestyle='--', label=f"{col} Trendline")
+            if out_vals is not None:
+                spikes, drops = split_outliers(values, out_vals)
+                if spikes.any():
+                    ax.scatter(dates[spikes], values[spikes], color='green', s=50, label='Spike')
+                if drops.any():
+                    ax.scatter(dates[drops], values[drops], color='red', s=50, label='Drop')
+        ax.set_xlabel("Date")
+        ax.set_ylabel("Value")
+        ax.set_title(f"{mine} Output")
+        ax.legend()
+        fig.autofmt_xdate()
+        fig.tight_layout()
+    elif chart_type == "histogram":
+        for col, values, _ in task["series"]:
+            ax.hist(values, bins=15, alpha=0.5, label=col)
+        ax.set_xlabel("Value")
+        ax.set_ylabel("Count")
+        ax.set_title(f"{mine} Histogram")
+        ax.legend()
+        fig.tight_layout()
+    elif chart_type == "violin":
+        cols = [col for col, _, _ in task["series"]]
+        ax.violinplot([values for _, values, _ in task["series"]], showmeans=True)
+        ax.set_xticks(np.arange(1, len(cols) + 1))
+        ax.set_xticklabels(cols)
+        ax.set_ylabel("Value")
+        ax.set_title(f"{mine} Violin Plot")
+        fig.tight_layout()
+
+    img_buffer = io.BytesIO()
+    fig.savefig(img_buffer, format='PNG', bbox_inches='tight')
+    plt.close(fig)
+    return img_buffer.getvalue()
+
+
+def chart_key(task, version):
+    # The plotted data and the outlier mask (which depends on the detector
+    # thresholds, not just the type) are hashed into the key, so charts of
+    # different data never share an entry even when version is None
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(np.ascontiguousarray(task["dates"]).view(np.uint8).tobytes())
+    for col, values, out_vals in task["series"]:
+        digest.update(col.encode())
+        digest.update(np.ascontiguousarray(values).tobytes())
+        digest.update(np.ascontiguousarray(task["trends"].get(col, ())).tobytes())
+        if out_vals is not None:
+            digest.update(np.packbits(np.asarray(out_vals, dtype=bool)).tobytes())
+    return (task["mine"], version, task["chart_type"], task["trendline_degree"],
+            task["outlier_type"], digest.hexdigest())
+
+
+def chart_tasks(df, stats_data, chart_type, trendline_degree, outlier_type, version=None):
+    dates = df['Date'].to_numpy()
+    # Fitted once here (and shared with the Dash chart via trendline's cache);
+    # workers only draw the evaluated curves
+    trends = trendline.trend_values(df, trendline_degree, version=version) if chart_type == "line" else {}
+    tasks = []
+    for mine, mine_data in stats_data.items():
+        cols = [mine] if mine in df.columns else df.columns[1:]
+        series = []
+        for col in cols:
+            out_vals = None
+            if chart_type == "line" and outlier_type != "none":
+                out_vals = mine_data.get(f"{outlier_type}_Outliers", [])
+            series.append((col, df[col].to_numpy(dtype=float), out_vals))
+        tasks.append({"mine": mine, "chart_type": chart_type, "trendline_degree": trendline_degree,
+                      "outlier_type": outlier_type, "dates": dates, "series": series,
+                      "trends": {col: trends[col] for col in cols if col in trends}})
+    return tasks
+
+
+def render_charts(tasks, version, progress=None):
+    # Cached PNGs are reused; the rest are rendered in the process pool and
+    # come back in task order. progress(done, total) is called per chart.
+    keys = [chart_key(task, version) for task in tasks]
+    with _cache_lock:
+        images = [_chart_cache.get(key) for key in keys]
+    done = sum(image is not None for image in images)
+    if progress:
+        progress(done, len(tasks))
+    # A broken pool is rebuilt and the charts still missing are retried once
+    for attempt in range(2):
+        pending = [i for i, image in enumerate(images) if image is None]
+        executor = get_executor() if len(pending) > 1 and REPORT_WORKERS > 1 else None
+        try:
+            if executor:
+                rendered = executor.map(render_chart, [tasks[i] for i in pending])
+            else:
+                rendered = map(render_chart, [tasks[i] for i in pending])
+            for i, image in zip(pending, rendered):
+                images[i] = image
+                done += 1
+                if progress:
+                    progress(done, len(tasks))
+            break
+        except BrokenProcessPool:
+            reset_executor(executor)
+            if attempt:
+                raise
+    with _cache_lock:
+        for key, image in zip(keys, images):
+            _chart_cache[key] = image
+            _chart_cache.move_to_end(key)
+        while len(_chart_cache) > CHART_CACHE_SIZE:
+            _chart_cache.popitem(last=False)
+    return images
+
+
+def metric_rows(mine_data):
+    table_data = [["Metric", "Value"]]
+    for key in ["Mean","Std Dev","Median","IQR",
+                "IQR_Outliers_Count","Zscore_Outliers_Count",
+                "MA_Outliers_Count","Grubbs_Outliers_Count"]:
+        val = mine_data.get(key, "N/A")
+        if isinstance(val, (float,int)):
+            val = round(val,2)
+        table_data.append([key,str(val)])
+    return table_data
+
+
+def build_pdf(df, stats_data, chart_type, trendline_degree, outlier_type, version=None, progress=None):
+    tasks = chart_tasks(df, stats_data, chart_type, trendline_degree, outlier_type, version)
+    tables = [metric_rows(mine_data) for mine_data in stats_data.values()]
+    # Whole-report cache: doc.build re-encodes every image, so an unchanged
+    # report is served from here rather than rebuilt from cached charts
+    pdf_key = (tuple(chart_key(task, version) for task in tasks), repr(tables))
+    with _cache_lock:
+        if pdf_key in _pdf_cache:
+            _pdf_cache.move_to_end(pdf_key)
+            return _pdf_cache[pdf_key]
+
+    images = render_charts(tasks, version, progress)
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    elements = []
+    styles = getSampleStyleSheet()
+    styleH = styles["Heading1"]
+    for mine, table_data, image in zip(stats_data, tables, images):
+        elements.append(Paragraph(f"Mine: {mine}", styleH))
+        elements.append(Spacer(1, 12))
+        t = Table(table_data, hAlign='CENTER', colWidths=[150,100])
+        t.setStyle(TableStyle([
+            ('BACKGROUND',(0,0),(-1,0),colors.HexColor('#3498db')),
+            ('TEXTCOLOR',(0,0),(-1,0),colors.white),
+            ('ALIGN',(0,0),(-1,-1),'CENTER'),
+            ('FONTNAME',(0,0),(-1,0),'Helvetica-Bold'),
+            ('FONTSIZE',(0,0),(-1,0),11),
+            ('BOTTOMPADDING',(0,0),(-1,0),4),
+            ('GRID',(0,0),(-1,-1),0.5,colors.grey)
+        ]))
+        elements.append(t)
+        elements.append(Spacer(1,12))
+        elements.append(Image(io.BytesIO(image), width=500, height=350))
+        elements.append(PageBreak())
+
+    doc.build(elements)
+    pdf = buffer.getvalue()
+    with _cache_lock:
+        _pdf_cache[pdf_key] = pdf
+        while len(_pdf_cache) > PDF_CACHE_SIZE:
+            _pdf_cache.popitem(last=False)
+    return pdf
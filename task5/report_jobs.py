@@ -0,0 +1,91 @@
+import json
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import report
+
+JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class ReportJobs:
+    """Runs report.build_pdf off the request thread.
+
+    Jobs queue on a small thread pool (the charts themselves still fan out to
+    report's process pool). Status and the finished PDF are written under
+    directory, so a poll that lands on another worker of the same host can
+    still see progress and serve the file.
+    """
+
+    def __init__(self, directory, max_workers=2, max_jobs=32):
+        self.directory = directory
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def pdf_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.pdf")
+
+    def _set(self, job_id, **fields):
+        with self._lock:
+            status = self._jobs.setdefault(job_id, {"id": job_id})
+            status.update(fields)
+            snapshot = dict(status)
+        tmp_path = self._status_path(job_id) + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self._status_path(job_id))
+
+    def _prune(self):
+        # Drop the oldest finished jobs and their files beyond max_jobs
+        with self._lock:
+            finished = [job_id for job_id, status in self._jobs.items()
+                        if status["state"] in ("done", "failed")]
+            stale = finished[:max(0, len(self._jobs) - self.max_jobs)]
+            for job_id in stale:
+                del self._jobs[job_id]
+        for job_id in stale:
+            for path in (self._status_path(job_id), self.pdf_path(job_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def _run(self, job_id, df, stats_data, chart_type, trendline_degree, outlier_type, version):
+        self._set(job_id, state="running")
+        try:
+            pdf = report.build_pdf(df, stats_data, chart_type, trendline_degree, outlier_type, version,
+                                   progress=lambda done, total: self._set(job_id, done=done, total=total))
+            tmp_path = self.pdf_path(job_id) + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(pdf)
+            os.replace(tmp_path, self.pdf_path(job_id))
+            self._set(job_id, state="done", done=len(stats_data))
+        except Exception as e:
+            self._set(job_id, state="failed", error=str(e))
+
+    def submit(self, df, stats_data, chart_type, trendline_degree, outlier_type, version=None):
+        job_id = uuid.uuid4().hex
+        self._set(job_id, state="queued", done=0, total=len(stats_data))
+        self._prune()
+        self._executor.submit(self._run, job_id, df, stats_data, chart_type,
+                              trendline_degree, outlier_type, version)
+        return job_id
+
+    def status(self, job_id):
+        # job ids come back from the browser, so only accept our own format
+        if not isinstance(job_id, str) or not JOB_ID.fullmatch(job_id):
+            return None
+        with self._lock:
+            if job_id in self._jobs:
+                return dict(self._jobs[job_id])
+        try:
+            with open(self._status_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,216 @@
+import warnings
+from bisect import bisect_left, insort
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Rolling baselines and robust deviation scores for many series at once.
+# Inputs are 1-D series or (n_series, n_points) blocks as built by
+# helper_func.column_block; NaNs are missing readings and never count
+# towards a window.
+
+KINDS = ["mean", "median", "ewma"]
+MAD_SCALE = 1.4826
+# Up to this width a median over sliding-window views beats pandas' skiplist
+SLIDING_MAX_WINDOW = 16
+CHUNK_ELEMENTS = 1 << 22
+# Medians over views cost O(n * window); above this width rolling_mad slides a
+# sorted window per series instead, O(n log window) but a Python loop
+MAD_SLIDING_MAX_WINDOW = 128
+
+
+def as_block(values):
+    block = np.asarray(values, dtype=float)
+    return np.atleast_2d(block), block.ndim == 1
+
+
+def _pad(window, center):
+    # Points before/after each position covered by its window; centered
+    # windows follow pandas' center=True alignment
+    if center:
+        return window // 2, (window - 1) // 2
+    return window - 1, 0
+
+
+def _padded(block, window, center):
+    before, after = _pad(window, center)
+    return np.pad(block, ((0, 0), (before, after)), constant_values=np.nan)
+
+
+def rolling_mean(values, window, center=False, min_periods=None):
+    # pandas' windowed sums are Kahan-compensated; a plain cumsum difference
+    # loses digits on long series with a large offset
+    block, flat = as_block(values)
+    min_periods = window if min_periods is None else min_periods
+    mean = _pandas_rolling(block, window, center, max(min_periods, 1)).mean().to_numpy().T
+    return mean[0] if flat else mean
+
+
+def _sliding_apply(block, window, center, func):
+    # func over (rows, windows, window) views, chunked so the temporary copies
+    # np.median makes stay around CHUNK_ELEMENTS floats
+    padded = _padded(block, window, center)
+    n_points = block.shape[1]
+    out = np.empty(block.shape)
+    step = max(CHUNK_ELEMENTS // (window * max(len(block), 1)), 1)
+    for start in range(0, n_points, step):
+        stop = min(start + step, n_points)
+        views = sliding_window_view(padded[:, start:stop + window - 1], window, axis=1)
+        out[:, start:stop] = func(views, start, stop)
+    return out
+
+
+def _pandas_rolling(block, window, center, min_periods):
+    return pd.DataFrame(block.T).rolling(window, center=center, min_periods=min_periods)
+
+
+def rolling_median(values, window, center=False, min_periods=None):
+    block, flat = as_block(values)
+    min_periods = window if min_periods is None else min_periods
+    if window <= SLIDING_MAX_WINDOW and min_periods == window and not np.isnan(block).any():
+        # Without gaps, every full window is a plain median over the view
+        median = _sliding_apply(block, window, center, lambda views, start, stop: np.median(views, axis=2))
+    else:
+        median = _pandas_rolling(block, window, center, min_periods).median().to_numpy().T
+    return median[0] if flat else median
+
+
+def rolling_mad(values, window, center=False, min_periods=None, median=None):
+    # Median absolute deviation of each window from that window's median
+    block, flat = as_block(values)
+    min_periods = window if min_periods is None else min_periods
+    if median is None:
+        median = rolling_median(block, window, center, min_periods)
+    median = np.atleast_2d(median)
+
+    if window > MAD_SLIDING_MAX_WINDOW:
+        result = np.array([_sorted_window_mad(row, row_median, window, center)
+                           for row, row_median in zip(block, median)]).reshape(block.shape)
+        return result[0] if flat else result
+
+    def mad(views, start, stop):
+        with np.errstate(invalid='ignore'):
+            deviation = np.abs(views - median[:, start:stop, None])
+        if np.isnan(deviation).any():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)
+                return np.nanmedian(deviation, axis=2)
+        return np.median(deviation, axis=2)
+
+    result = _sliding_apply(block, window, center, mad)
+    result[np.isnan(median)] = np.nan
+    return result[0] if flat else result
+
+
+def _sorted_window_mad(row, median, window, center):
+    # O(n log window): slide a sorted list of the window's non-NaN readings.
+    # The deviations left and right of the median are two sorted runs, so the
+    # k-th smallest is found by bisecting on how many of the k + 1 smallest
+    # come from the left run, starting from the previous window's split
+    before, after = _pad(window, center)
+    values = row.tolist()
+    n_points = len(values)
+    # Readings entering and leaving the window as it moves onto each point
+    entering = (values[after:] + [np.nan] * after)[:n_points]
+    leaving = ([np.nan] * (before + 1) + values)[:n_points]
+    win = sorted(v for v in values[:min(after, n_points)] if v == v)
+    out = np.full(n_points, np.nan)
+    split = 0
+    for t, (m, new, old) in enumerate(zip(median.tolist(), entering, leaving)):
+        if new == new:
+            insort(win, new)
+        if old == old:
+            del win[bisect_left(win, old)]
+        if m != m or not win:
+            continue
+        size = len(win)
+        k = (size - 1) // 2
+        p = bisect_left(win, m)
+        lo, hi = max(0, k + 1 - (size - p)), min(k + 1, p)
+        # Probe the previous split and its neighbour before bisecting
+        i = min(max(split, lo), hi - 1)
+        for _ in range(2):
+            if lo < hi:
+                if win[p + k - i] - m > m - win[p - 1 - i]:
+                    lo = i = i + 1
+                else:
+                    hi, i = i, i - 1
+        while lo < hi:
+            i = (lo + hi) // 2
+            if win[p + k - i] - m > m - win[p - 1 - i]:
+                lo = i + 1
+            else:
+                hi = i
+        split = i = lo
+        j = k + 1 - i
+        kth = max(m - win[p - i] if i else 0.0, win[p + j - 1] - m if j else 0.0)
+        if size % 2:
+            out[t] = kth
+        else:
+            following = min(m - win[p - 1 - i] if i < p else np.inf, win[p + j] - m if j < size - p else np.inf)
+            out[t] = (kth + following) / 2
+    return out
+
+
+def ewma(values, window, min_periods=None):
+    # Span-based exponential mean; gaps are skipped rather than decayed over
+    block, flat = as_block(values)
+    min_periods = window if min_periods is None else min_periods
+    frame = pd.DataFrame(block.T).ewm(span=window, adjust=False, ignore_na=True, min_periods=min_periods)
+    result = frame.mean().to_numpy().T
+    return result[0] if flat else result
+
+
+def rolling_baseline(values, window, kind="mean", center=False, min_periods=None):
+    if kind == "mean":
+        return rolling_mean(values, window, center, min_periods)
+    if kind == "median":
+        return rolling_median(values, window, center, min_periods)
+    if kind == "ewma":
+        if center:
+            raise ValueError("EWMA baselines are trailing only")
+        return ewma(values, window, min_periods)
+    raise ValueError(f"unknown rolling baseline {kind!r}, expected one of {KINDS}")
+
+
+def _ratio(deviation, scale):
+    # A zero scale only tolerates zero deviation; NaN in either stays NaN
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ratio = deviation / scale
+    return np.where(scale == 0, np.where(deviation == 0, 0.0, np.inf), ratio)
+
+
+def percent_deviation(values, baseline):
+    # |x - baseline| / baseline as a percentage, the original MA detector's
+    # rule: a negative baseline gives a negative score and never flags
+    values = np.asarray(values, dtype=float)
+    baseline = np.asarray(baseline, dtype=float)
+    with np.errstate(invalid='ignore'):
+        deviation = np.abs(values - baseline)
+    return _ratio(deviation, baseline) * 100
+
+
+def robust_zscore(values, median, mad):
+    values = np.asarray(values, dtype=float)
+    with np.errstate(invalid='ignore'):
+        deviation = np.abs(values - median)
+    return _ratio(deviation, MAD_SCALE * np.asarray(mad, dtype=float))
+
+
+def rolling_outliers(df, window=5, threshold=20, kind="mean", center=False, scale="percent"):
+    """Boolean frame flagging readings that stray from their rolling baseline.
+
+    scale="percent" compares |x - baseline| / baseline * 100 to threshold;
+    scale="mad" compares the rolling robust z-score |x - median| / (1.4826 * MAD)
+    to threshold and always uses a rolling median baseline.
+    """
+    cols = df.columns[1:]
+    block = df[cols].to_numpy(dtype=float).T
+    if scale == "mad":
+        median = rolling_median(block, window, center)
+        score = robust_zscore(block, median, rolling_mad(block, window, center, median=median))
+    elif scale == "percent":
+        score = percent_deviation(block, rolling_baseline(block, window, kind, center))
+    else:
+        raise ValueError(f"unknown scale {scale!r}, expected 'percent' or 'mad'")
+    return pd.DataFrame(score.T > threshold, index=df.index, columns=cols)
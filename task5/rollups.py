@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+import pandas as pd
+
+RESOLUTIONS = {"daily": "D", "weekly": "W-MON", "monthly": "MS"}
+AGGREGATES = ["sum", "mean", "min", "max", "count"]
+ROLLUP_CACHE_SIZE = 16
+
+
+def build_rollup(df, freq):
+    # One table per aggregate, each shaped like the raw frame: Date + mine columns,
+    # with every bucket labelled by its start date
+    cols = list(df.columns[1:])
+    grouped = df.groupby(pd.Grouper(key="Date", freq=freq, closed="left", label="left"))[cols].agg(AGGREGATES)
+    counts = grouped.xs("count", axis=1, level=1)
+    # Buckets with no readings at all (gaps in the calendar) are dropped
+    grouped = grouped[counts.sum(axis=1) > 0]
+    tables = {}
+    for agg in AGGREGATES:
+        table = grouped.xs(agg, axis=1, level=1).reset_index()
+        tables[agg] = table[["Date"] + cols]
+    return tables
+
+
+class Rollup:
+    """Rollup tables of one frame at one resolution.
+
+    extend() takes a frame that only appended rows to the one this rollup was
+    built from and recomputes just the last (possibly partial) bucket onwards.
+    """
+
+    def __init__(self, df, freq):
+        self.freq = freq
+        self.tables = build_rollup(df, freq)
+        self._remember(df)
+
+    def _remember(self, df):
+        self.row_count = len(df)
+        self.last_row = df.iloc[-1].tolist() if len(df) else None
+        self.columns = list(df.columns)
+
+    def extends(self, df):
+        # Cheap append-only check: same columns, at least as many rows, and the
+        # row we ended on is still in place with dates in order
+        if list(df.columns) != self.columns or len(df) < self.row_count or self.last_row is None:
+            return False
+        tail = df["Date"].iloc[self.row_count - 1:]
+        return df.iloc[self.row_count - 1].tolist() == self.last_row and tail.is_monotonic_increasing
+
+    def copy(self):
+        other = Rollup.__new__(Rollup)
+        other.freq = self.freq
+        other.tables = dict(self.tables)
+        other.row_count, other.last_row, other.columns = self.row_count, self.last_row, self.columns
+        return other
+
+    def extend(self, df):
+        if len(df) == self.row_count:
+            return self
+        last_start = self.tables["count"]["Date"].iloc[-1]
+        fresh = build_rollup(df[df["Date"] >= last_start], self.freq)
+        for agg in AGGREGATES:
+            kept = self.tables[agg][self.tables[agg]["Date"] < last_start]
+            self.tables[agg] = pd.concat([kept, fresh[agg]], ignore_index=True)
+        self._remember(df)
+        return self
+
+
+class RollupStore:
+    # Rollups per (data version, resolution); a new version that only appends
+    # rows to a cached one is extended instead of rebuilt
+    def __init__(self, max_entries=ROLLUP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._rollups = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, df, version, resolution):
+        freq = RESOLUTIONS[resolution]
+        with self._lock:
+            key = (version, resolution)
+            if key in self._rollups:
+                self._rollups.move_to_end(key)
+                return self._rollups[key]
+            base = next((rollup for (_, res), rollup in reversed(self._rollups.items())
+                         if res == resolution and rollup.extends(df)), None)
+        if base is not None:
+            rollup = base.copy().extend(df)
+        else:
+            rollup = Rollup(df, freq)
+        with self._lock:
+            self._rollups[(version, resolution)] = rollup
+            while len(self._rollups) > self.max_entries:
+                self._rollups.popitem(last=False)
+        return rollup
+
+    def view(self, df, version, resolution, agg="mean"):
+        """Frame to analyse and plot at resolution, plus a version token for it."""
+        if resolution in (None, "raw") or len(df.columns) < 2 or len(df) == 0:
+            return df, version
+        rollup = self.get(df, version, resolution)
+        return rollup.tables[agg], f"{version}:{resolution}:{agg}"
+
+
+rollup_store = RollupStore()
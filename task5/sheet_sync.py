@@ -0,0 +1,125 @@
+import os
+import threading
+import pandas as pd
+from online_stats import OnlineStats
+
+
+def records_frame(header, rows):
+    # Same shaping as get_all_records(): pad short rows, numericise cells
+    from gspread.utils import numericise_all
+    width = len(header)
+    rows = [numericise_all((list(row) + [""] * width)[:width]) for row in rows]
+    df = pd.DataFrame(rows, columns=header)
+    # Blank cells stay '' after numericise_all; as NaN they are missing
+    # readings, which every stats path skips
+    for col in header[1:]:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    if len(df):
+        df['Date'] = pd.to_datetime(df['Date'], dayfirst=True)
+    return df
+
+
+class SheetSync:
+    """Incremental mirror of the "Data" worksheet in a local Parquet snapshot.
+
+    load_snapshot() never touches the network and re-reads the file whenever
+    its mtime changes, so a sync by another thread or process shows up.
+    sync() compares the header, fetches only the rows appended after the last
+    synced row with one range read, and appends them to the snapshot. A
+    changed header or a shrunken sheet falls back to a full read. Rows edited in place above the last
+    synced row are not picked up until the next full read (resync()).
+
+    online_stats() keeps streaming per-mine statistics next to the snapshot:
+    appended rows are merged in O(batch), a full read starts them over.
+    """
+
+    def __init__(self, client_factory, snapshot_path, sheet_name="task5_gs", worksheet_name="Data"):
+        self.client_factory = client_factory
+        self.snapshot_path = snapshot_path
+        self.sheet_name = sheet_name
+        self.worksheet_name = worksheet_name
+        self._client = None
+        self._df = None
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._online = None
+        self.fetched_rows = 0
+
+    def _worksheet(self):
+        if self._client is None:
+            self._client = self.client_factory()
+        return self._client.open(self.sheet_name).worksheet(self.worksheet_name)
+
+    def snapshot_mtime(self):
+        try:
+            return os.stat(self.snapshot_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load_snapshot(self):
+        mtime = self.snapshot_mtime()
+        if mtime is not None and mtime != self._mtime:
+            self._df = pd.read_parquet(self.snapshot_path)
+            self._mtime = mtime
+            self._online = None
+        return self._df
+
+    def _save(self, df):
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, self.snapshot_path)
+        self._df = df
+        self._mtime = self.snapshot_mtime()
+
+    def _full_read(self, ws):
+        self._online = None
+        values = ws.get_values()
+        self.fetched_rows += max(len(values) - 1, 0)
+        if not values:
+            return pd.DataFrame()
+        return records_frame(values[0], values[1:])
+
+    def sync(self):
+        with self._lock:
+            ws = self._worksheet()
+            df = self.load_snapshot()
+            header = ws.row_values(1)
+            if df is None or list(df.columns) != header:
+                df = self._full_read(ws)
+            else:
+                # Sheet row 1 is the header, so data row i lives on sheet row i + 2.
+                # ws.row_count is the grid size, blank rows included; the last
+                # filled row comes from column A
+                last_row = len(ws.col_values(1))
+                first_new = len(df) + 2
+                if first_new <= last_row:
+                    new_rows = [row for row in ws.get_values(f"{first_new}:{last_row}") if any(row)]
+                    self.fetched_rows += len(new_rows)
+                    if new_rows:
+                        df_new = records_frame(header, new_rows)
+                        df = pd.concat([df, df_new], ignore_index=True)
+                        if self._online is not None:
+                            self._online.update(df_new)
+                elif first_new > last_row + 1:
+                    df = self._full_read(ws)
+            if df is not self._df:
+                self._save(df)
+            return df
+
+    def resync(self):
+        with self._lock:
+            self._save(self._full_read(self._worksheet()))
+            return self._df
+
+    def online_stats(self):
+        # Summary of the streaming stats, built from the snapshot on first use
+        with self._lock:
+            if self._online is None:
+                df = self.load_snapshot()
+                if df is None:
+                    return {}
+                self._online = OnlineStats.from_frame(df)
+            return self._online.summary()
@@ -0,0 +1,116 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+import pandas as pd
+import helper_func
+
+
+def frame_key(df):
+    # Content hash of the frame: values, index and column names
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    h.update("\x1f".join(map(str, df.columns)).encode())
+    return h.hexdigest()
+
+
+def result_size(result):
+    # Rough footprint of a compute_stats result: the outlier lists dominate
+    return sum(sys.getsizeof(value) for mine in result.values() for value in mine.values()
+               if isinstance(value, list))
+
+
+class StatsCache:
+    """LRU cache for compute_stats.
+
+    Threshold-independent intermediates (compute_base) are kept per data hash,
+    so a slider change only re-derives the masks. Finished results are kept per
+    (data hash, parameters) on top of that, up to max_result_bytes in total,
+    so going back to a previous setting is a dict lookup.
+
+    The global lock only guards the dictionaries. Bases are computed under a
+    per-key stripe lock, so callers for other data never wait on them, and
+    masks are derived with no cache lock held.
+    """
+
+    def __init__(self, max_frames=4, max_result_bytes=64 << 20, stripes=16):
+        self.max_frames = max_frames
+        self.max_result_bytes = max_result_bytes
+        self._bases = OrderedDict()
+        self._results = OrderedDict()
+        self._result_bytes = 0
+        self._lock = threading.Lock()
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    def _cached_base(self, key):
+        with self._lock:
+            base = self._bases.get(key)
+            if base is not None:
+                self._bases.move_to_end(key)
+                self.partial_hits += 1
+            return base
+
+    def _base(self, key, df):
+        base = self._cached_base(key)
+        if base is not None:
+            return base
+        # Concurrent misses on the same data compute it once
+        with self._stripes[hash(key) % len(self._stripes)]:
+            base = self._cached_base(key)
+            if base is not None:
+                return base
+            base = helper_func.compute_base(df)
+            with self._lock:
+                self.misses += 1
+                self._bases[key] = base
+                if len(self._bases) > self.max_frames:
+                    self._bases.popitem(last=False)
+            return base
+
+    def _store(self, result_key, result):
+        with self._lock:
+            if result_key in self._results:
+                return
+            self._results[result_key] = result
+            self._result_bytes += result_size(result)
+            while self._result_bytes > self.max_result_bytes and len(self._results) > 1:
+                _, evicted = self._results.popitem(last=False)
+                self._result_bytes -= result_size(evicted)
+
+    def compute_stats(self, df, iqr_mult=1.5, z_thresh=3, ma_window=5, ma_percent=20,
+                      grubbs_alpha=0.05, key=None):
+        if key is None:
+            key = frame_key(df)
+        params = (iqr_mult, z_thresh, ma_window, ma_percent, grubbs_alpha)
+        with self._lock:
+            result = self._results.get((key, params))
+            if result is not None:
+                self._results.move_to_end((key, params))
+                self.hits += 1
+                return result
+        result = helper_func.derive_stats(self._base(key, df), *params)
+        self._store((key, params), result)
+        return result
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+            "frames": len(self._bases),
+            "results": len(self._results),
+            "result_bytes": self._result_bytes,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._bases.clear()
+            self._results.clear()
+            self._result_bytes = 0
+            self.hits = self.partial_hits = self.misses = 0
+
+
+stats_cache = StatsCache()
@@ -0,0 +1,68 @@
+import warnings
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+import helper_func
+
+
+def esd_reference(series, max_outliers, alpha=0.05):
+    # Textbook generalized ESD: drop the most extreme point and recompute, max_outliers times
+    s = series.dropna()
+    removed = []
+    n_outliers = 0
+    for step in range(1, max_outliers + 1):
+        n = len(s)
+        if n < 3:
+            break
+        dev = (s - s.mean()).abs()
+        label = dev.idxmax()
+        r = dev[label] / s.std()
+        t = stats.t.ppf(1 - alpha / (2 * n), n - 2)
+        critical = (n - 1) * t / np.sqrt((n - 2 + t ** 2) * n)
+        removed.append(label)
+        if r > critical:
+            n_outliers = step
+        s = s.drop(label)
+    mask = pd.Series(False, index=series.index)
+    mask[removed[:n_outliers]] = True
+    return mask
+
+
+def heavy_tailed(seed, n=200, gaps=False):
+    rng = np.random.default_rng(seed)
+    values = rng.standard_t(2, n) * 10 + 100
+    if gaps:
+        values[rng.random(n) < 0.1] = np.nan
+    return pd.Series(values)
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("gaps", [False, True])
+def test_generalized_esd_matches_reference(seed, gaps):
+    series = heavy_tailed(seed, gaps=gaps)
+    expected = esd_reference(series, max_outliers=20)
+    assert helper_func.generalized_esd(series, max_outliers=20).equals(expected)
+
+
+def test_generalized_esd_sees_masked_outliers():
+    # Three equal outliers mask each other for Grubbs; ESD's look-ahead finds them
+    series = pd.Series(np.r_[np.linspace(9, 11, 12), 15.0, 15.0, 15.0])
+    assert not helper_func.grubbs_test(series).any()
+    assert helper_func.generalized_esd(series, max_outliers=4).tolist() == [False] * 12 + [True] * 3
+
+
+@pytest.mark.parametrize("seed", range(20))
+@pytest.mark.parametrize("gaps", [False, True])
+def test_grubbs_matches_reference_loop(seed, gaps):
+    series = heavy_tailed(seed, gaps=gaps)
+    assert helper_func.grubbs_test(series).equals(helper_func.grubbs_test_loop(series))
+
+
+def test_constant_tail_has_no_warnings():
+    series = pd.Series([5.0] * 10 + [100.0])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        grubbs = helper_func.grubbs_test(series)
+        esd = helper_func.generalized_esd(series, max_outliers=3)
+    assert grubbs.tolist() == esd.tolist() == [False] * 10 + [True]
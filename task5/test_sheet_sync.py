@@ -0,0 +1,38 @@
+import numpy as np
+from fake_sheets import FakeClient, FakeSpreadsheet, FakeWorksheet
+from sheet_sync import SheetSync
+
+
+def make_sync(tmp_path, rows):
+    ws = FakeWorksheet(rows)
+    client = FakeClient({"task5_gs": FakeSpreadsheet({"Data": ws})})
+    return ws, SheetSync(lambda: client, str(tmp_path / "snapshot.parquet"))
+
+
+def test_appended_row_with_blank_cell(tmp_path):
+    ws, sync = make_sync(tmp_path, [["Date", "A", "B"], ["01/01/2024", 1, 2], ["02/01/2024", 3, 4]])
+    sync.sync()
+    sync.online_stats()
+    ws.append_row(["03/01/2024", "", 5])
+    df = sync.sync()
+    assert len(df) == 3
+    assert np.isnan(df["A"].iloc[2])
+    assert df["B"].tolist() == [2, 4, 5]
+    assert sync.online_stats()["A"]["Mean"] == 2
+    # The snapshot round-trips through Parquet with the gap intact
+    assert SheetSync(None, sync.snapshot_path).load_snapshot()["A"].isna().sum() == 1
+
+
+def test_blank_cell_on_first_sync(tmp_path):
+    ws, sync = make_sync(tmp_path, [["Date", "A"], ["01/01/2024", ""], ["02/01/2024", 7]])
+    df = sync.sync()
+    assert df["A"].dtype == float
+    assert df["A"].isna().tolist() == [True, False]
+
+
+def test_shrunken_sheet_falls_back_to_full_read(tmp_path):
+    ws, sync = make_sync(tmp_path, [["Date", "A"]] + [[f"{day:02d}/01/2024", day] for day in range(1, 11)])
+    sync.sync()
+    del ws.values[6:]
+    assert ws.row_count == 1000
+    assert len(sync.sync()) == 5
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+
+TREND_CACHE_SIZE = 32
+# Centered rolling mean window for the 'rolling' trend, as a share of the series
+ROLLING_FRACTION = 0.05
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+def fit_polynomials(df, degree):
+    # One least-squares solve: np.polyfit with a 2-D right-hand side shares the
+    # Vandermonde matrix across every complete column. Columns with gaps are
+    # fitted on their own valid rows.
+    cols = list(df.columns[1:])
+    values = df[cols].to_numpy(dtype=float)
+    x = np.arange(len(df))
+    coeffs = {}
+    complete = ~np.isnan(values).any(axis=0)
+    if complete.any() and len(df) > degree:
+        fitted = np.polyfit(x, values[:, complete], degree)
+        for j, c in zip(np.flatnonzero(complete), fitted.T):
+            coeffs[cols[j]] = c
+    for j in range(len(cols)):
+        if cols[j] in coeffs:
+            continue
+        ok = ~np.isnan(values[:, j])
+        coeffs[cols[j]] = np.polyfit(x[ok], values[ok, j], degree) if ok.sum() > degree \
+            else np.full(degree + 1, np.nan)
+    return coeffs
+
+
+def rolling_trends(df):
+    window = max(3, int(len(df) * ROLLING_FRACTION))
+    rolled = df[df.columns[1:]].rolling(window=window, center=True, min_periods=1).mean()
+    return {col: rolled[col].to_numpy() for col in rolled.columns}
+
+
+def trend_model(df, trend, version=None):
+    """Per-column coefficients (int degree) or smoothed series ('rolling'),
+    cached by data version so the chart and PDF paths share one fit."""
+    key = (version, trend, tuple(df.columns[1:]))
+    if version is not None:
+        with _lock:
+            if key in _cache:
+                _cache.move_to_end(key)
+                return _cache[key]
+    model = rolling_trends(df) if trend == 'rolling' else fit_polynomials(df, int(trend))
+    if version is not None:
+        with _lock:
+            _cache[key] = model
+            while len(_cache) > TREND_CACHE_SIZE:
+                _cache.popitem(last=False)
+    return model
+
+
+def polyval(coeffs, x):
+    # Horner evaluation, highest power first like np.polyfit output
+    y = np.full(len(x), coeffs[0], dtype=float)
+    for c in coeffs[1:]:
+        y = y * x + c
+    return y
+
+
+def trend_values(df, trend, x_idx=None, version=None):
+    # Trend of every mine column at row positions x_idx (all rows by default)
+    if x_idx is None:
+        x_idx = np.arange(len(df))
+    model = trend_model(df, trend, version)
+    if trend == 'rolling':
+        return {col: series[x_idx] for col, series in model.items()}
+    return {col: polyval(coeffs, x_idx) for col, coeffs in model.items()}
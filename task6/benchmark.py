@@ -4,8 +4,10 @@ from urllib.parse import urlparse
 import os
 from dotenv import load_dotenv
 
-NUM_USERS = 500
+NUM_USERS = 5000
 BATCH_SIZE = 10
+PAGES = 50
+PAGE_SIZES = [10, 50, 200]
 locale = 'en_US'
 seed = 1
 load_dotenv()
@@ -19,20 +21,100 @@ conn = psycopg2.connect(
     password=result.password
 )
 cur = conn.cursor()
-start_time = time.time()
-users = []
-for batch_number in range(1, NUM_USERS // BATCH_SIZE + 1):
-    start_index = (batch_number - 1) * BATCH_SIZE
-    end_index = start_index + BATCH_SIZE - 1
-    cur.execute(
-        """
-        SELECT generate_fake_user(%s, %s, %s, gs)
-        FROM generate_series(%s, %s) AS gs;
-        """,
-        (locale, seed, batch_number, start_index, end_index)
-    )
-    users.extend([row[0] for row in cur.fetchall()])
-
-end_time = time.time()
-elapsed = end_time - start_time
-print(f"Generated {NUM_USERS} users in {elapsed:.2f} seconds ({NUM_USERS/elapsed:.2f} users/sec)")
\ No newline at end of file
+
+
+def report(label, elapsed, baseline=None):
+    rate = NUM_USERS / elapsed
+    line = f"{label:>32}: {NUM_USERS} users in {elapsed:.2f} seconds ({rate:.2f} users/sec)"
+    if baseline:
+        line += f" {rate / baseline:.1f}x"
+    print(line)
+    return rate
+
+
+def per_user(batch_size):
+    # generate_fake_user once per row, batch_size rows per query
+    start_time = time.time()
+    users = []
+    for batch_number in range(1, NUM_USERS // batch_size + 1):
+        start_index = (batch_number - 1) * batch_size
+        end_index = start_index + batch_size - 1
+        cur.execute(
+            """
+            SELECT generate_fake_user(%s, %s, %s, gs)
+            FROM generate_series(%s, %s) AS gs;
+            """,
+            (locale, seed, batch_number, start_index, end_index)
+        )
+        users.extend([row[0] for row in cur.fetchall()])
+    return time.time() - start_time
+
+
+def set_based(batch_size, version=2):
+    start_time = time.time()
+    users = []
+    for batch_number in range(1, NUM_USERS // batch_size + 1):
+        start_index = (batch_number - 1) * batch_size
+        cur.execute(
+            "SELECT fake_user FROM generate_fake_users(%s, %s, %s, %s, %s, %s);",
+            (locale, seed, batch_number, start_index, batch_size, version)
+        )
+        users.extend([row[0] for row in cur.fetchall()])
+    return time.time() - start_time
+
+
+def percentiles(times):
+    times = sorted(times)
+    return times[len(times) // 2] * 1000, times[int(len(times) * 0.95)] * 1000
+
+
+def round_trip_page(page, page_size):
+    # The old main.generate_fake_users: one query per user
+    users = []
+    for i in range(page_size):
+        cur.execute("SELECT generate_fake_user(%s, %s, %s, %s);",
+                    (locale, seed, page, (page - 1) * page_size + i))
+        users.append(cur.fetchone()[0])
+    return users
+
+
+def sql_page(page, page_size):
+    # main.generate_fake_users takes its connection from the request's app context
+    with main.app.app_context():
+        return main.generate_fake_users(locale, seed, page, page_size)
+
+
+def page_latency(label, generate, render_engine=None):
+    # Median / p95 ms for generating a page, and for a full render when the
+    # app is set to use render_engine
+    for page_size in PAGE_SIZES:
+        gen_times, render_times = [], []
+        for page in range(1, PAGES + 1):
+            start_time = time.perf_counter()
+            generate(page, page_size)
+            gen_times.append(time.perf_counter() - start_time)
+            if render_engine:
+                main.ENGINE = render_engine
+                start_time = time.perf_counter()
+                client.post("/", data={"Locale": locale, "seed": seed, "page": page, "page_size": page_size})
+                render_times.append(time.perf_counter() - start_time)
+        line = f"{label:>24}, {page_size:>3} per page: generate {'median %.1f ms, p95 %.1f ms' % percentiles(gen_times)}"
+        if render_times:
+            line += f", render {'median %.1f ms, p95 %.1f ms' % percentiles(render_times)}"
+        print(line)
+
+
+baseline = report("generate_fake_user, pages of 10", per_user(BATCH_SIZE))
+report("v1 set, pages of 10", set_based(BATCH_SIZE, version=1), baseline)
+report("v2 set, pages of 10", set_based(BATCH_SIZE), baseline)
+report("v2 set, one call", set_based(NUM_USERS), baseline)
+
+print()
+import main
+client = main.app.test_client()
+with main.app.app_context():
+    tables = main.get_lookup_tables()
+page_latency("per-user round trips", round_trip_page)
+page_latency("one set query", sql_page, "sql")
+page_latency("numpy engine", lambda page, size: main.engine.generate_users(
+    tables, locale, seed, page, (page - 1) * size, size), "numpy")
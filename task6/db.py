@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+def connect_args(db_url=None):
+    result = urlparse(db_url or os.environ.get('DATABASE_URL'))
+    return dict(
+        host=result.hostname,
+        port=result.port,
+        database=result.path[1:],
+        user=result.username,
+        password=result.password
+    )
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class Pool:
+    """Thread-safe connection pool; connection() blocks until one is free.
+
+    psycopg2's ThreadedConnectionPool raises as soon as maxconn connections are
+    out, so checkouts queue on a semaphore first and the wait is recorded.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=10.0, db_url=None):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = pg_pool.ThreadedConnectionPool(minconn, maxconn, **connect_args(db_url))
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._stats = dict(checkouts=0, waiting=0, in_use=0, wait_seconds=0.0, max_wait_seconds=0.0,
+                           timeouts=0, reconnects=0, broken=0, errors=0)
+
+    @classmethod
+    def from_env(cls):
+        maxconn = int(os.environ.get('DB_POOL_MAX', 10))
+        # psycopg2 closes returned connections once minconn are idle, so a
+        # lower minimum means reconnecting under load
+        return cls(
+            minconn=int(os.environ.get('DB_POOL_MIN', maxconn)),
+            maxconn=maxconn,
+            timeout=float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        )
+
+    def _count(self, **changes):
+        with self._lock:
+            for key, value in changes.items():
+                self._stats[key] += value
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _checkout(self):
+        # Every checkout gets a SELECT 1; dead connections are closed and the
+        # next one is tried. After a server restart every idle connection may
+        # be stale, and once they are gone the pool connects afresh, which
+        # either passes or raises.
+        while True:
+            conn = self._pool.getconn()
+            if self._healthy(conn):
+                return conn
+            self._pool.putconn(conn, close=True)
+            self._count(reconnects=1)
+
+    def acquire(self):
+        self._count(waiting=1)
+        start_time = time.monotonic()
+        acquired = self._slots.acquire(timeout=self.timeout)
+        waited = time.monotonic() - start_time
+        with self._lock:
+            self._stats['waiting'] -= 1
+            self._stats['wait_seconds'] += waited
+            self._stats['max_wait_seconds'] = max(self._stats['max_wait_seconds'], waited)
+        if not acquired:
+            self._count(timeouts=1)
+            raise PoolTimeout(f"no database connection free after {self.timeout}s")
+        try:
+            conn = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        self._count(checkouts=1, in_use=1)
+        return conn
+
+    def release(self, conn, failed=False):
+        # Failed requests roll back; connections that broke are closed, not reused
+        broken = conn.closed
+        if not broken:
+            try:
+                conn.rollback() if failed else conn.commit()
+            except psycopg2.Error:
+                broken = True
+        if failed:
+            self._count(errors=1)
+        if broken:
+            self._count(broken=1)
+        self._pool.putconn(conn, close=broken)
+        self._count(in_use=-1)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except BaseException:
+            self.release(conn, failed=True)
+            raise
+        self.release(conn)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            # private psycopg2 bookkeeping: connections currently open
+            stats['size'] = len(self._pool._pool) + len(self._pool._used)
+        stats['max_size'] = self.maxconn
+        stats['mean_wait_ms'] = stats['wait_seconds'] * 1000 / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def close(self):
+        self._pool.closeall()
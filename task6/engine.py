@@ -0,0 +1,315 @@
+import hashlib
+import json
+import sys
+import time
+from decimal import Decimal, ROUND_HALF_UP
+import numpy as np
+
+# In-process version of generate_fake_users(..., 2) from stored_procedures.py.
+# The lookup tables are read once, in ordinal order, into NumPy arrays; a batch
+# of users is then a handful of array gathers plus string formatting, with no
+# database round trip. Every formula below mirrors the SQL expression next to
+# it in the generator, including its evaluation order.
+
+NAME, TITLE, REGION, LOCATION, EYE, DOMAIN, EMAIL_PATTERN, PHONE_PATTERN, SUFFIX, WORD, EYE_COIN, DOMAIN_COIN = range(12)
+LANES = 12
+U_MIN = 1e-10
+U_MAX = float(Decimal(1) - Decimal("1e-10"))
+INT32_SCALE = 4294967295.0
+MICRO = Decimal("0.000001")
+
+
+def lpad(text, width, fill="0"):
+    # Postgres lpad truncates strings that are already too long
+    return text[:width] if len(text) >= width else text.rjust(width, fill)
+
+
+def digit_table(low, high, width):
+    # lpad(v::text, width, '0') for every v in range(low, high)
+    return np.array([lpad(str(v), width) for v in range(low, high)], dtype=object)
+
+
+RANDOM3 = digit_table(-500, 501, 3)
+STREET3 = digit_table(0, 1000, 3)
+STREET4 = digit_table(0, 10000, 4)
+
+
+def floor_int(values):
+    return np.floor(values).astype(np.int64)
+
+
+def numeric6(values):
+    # round(x::numeric, 6): the cast keeps 15 significant digits and numeric
+    # round() goes half away from zero. Away from a tie that is just the
+    # nearest micro-unit; the rare near-ties take the exact Decimal route.
+    scaled = values * 1e6
+    out = np.rint(scaled) / 1e6
+    with np.errstate(invalid="ignore"):
+        near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-3
+    for k in np.flatnonzero(near_tie):
+        out[k] = float(Decimal(f"{values[k]:.15g}").quantize(MICRO, ROUND_HALF_UP))
+    return [None if v != v else v for v in out.tolist()]
+
+
+class LocaleTables:
+    def __init__(self, locale):
+        self.locale = locale
+        self.names = {}
+        self.titles = {}
+        self.physical = {}
+        self.regions = []
+        self.eye_colors = []
+        self.email_domains = []
+        self.suffixes = []
+        self.words = []
+        self.phone_patterns = []
+        # table -> (cut, alias) arrays from lookup_alias, indexed by ord
+        self.alias = {}
+
+
+class LookupTables:
+    """Lookup rows for every locale, each list in ord order."""
+
+    def __init__(self):
+        self.locales = {}
+        self.email_patterns = []
+        # geo rows grouped by region: region -> (first row, count) into the arrays
+        self.geo_index = {}
+        self.geo = None
+
+    def locale(self, locale):
+        if locale not in self.locales:
+            self.locales[locale] = LocaleTables(locale)
+        return self.locales[locale]
+
+    @classmethod
+    def from_db(cls, conn):
+        tables = cls()
+        with conn.cursor() as cur:
+            cur.execute("SELECT locale, gender, first_name, last_name FROM names "
+                        "WHERE ord IS NOT NULL ORDER BY locale, gender, ord")
+            for locale, gender, first, last in cur.fetchall():
+                tables.locale(locale).names.setdefault(gender, []).append((first, last))
+            cur.execute("SELECT locale, gender, title FROM titles WHERE ord IS NOT NULL ORDER BY locale, gender, ord")
+            for locale, gender, title in cur.fetchall():
+                tables.locale(locale).titles.setdefault(gender, []).append(title)
+            cur.execute("SELECT locale, gender, height, weight FROM physical_attributes")
+            for locale, gender, height, weight in cur.fetchall():
+                tables.locale(locale).physical[gender] = (np.float32(height), np.float32(weight))
+            cur.execute("SELECT locale, data::text FROM regions WHERE ord IS NOT NULL ORDER BY locale, ord")
+            for locale, data in cur.fetchall():
+                tables.locale(locale).regions.append(json.loads(data))
+            for table, column in [("eye_colors", "eye_color"), ("email_domains", "domain"),
+                                  ("suffixes", "suffix"), ("words", "word")]:
+                cur.execute(f"SELECT locale, {column} FROM {table} WHERE ord IS NOT NULL ORDER BY locale, ord")
+                for locale, value in cur.fetchall():
+                    getattr(tables.locale(locale), table).append(value)
+            cur.execute("SELECT tbl, locale, array_agg(cut ORDER BY ord), array_agg(alias ORDER BY ord) "
+                        "FROM lookup_alias GROUP BY tbl, locale")
+            for table, locale, cut, alias in cur.fetchall():
+                tables.locale(locale).alias[table] = (np.array(cut, dtype=np.int64), np.array(alias, dtype=np.int64))
+            cur.execute("SELECT pattern FROM email_patterns WHERE ord IS NOT NULL ORDER BY ord")
+            tables.email_patterns = [row[0] for row in cur.fetchall()]
+            cur.execute("SELECT locale, pattern FROM phone_number_patterns WHERE ord IS NOT NULL ORDER BY ord")
+            phone_patterns = cur.fetchall()
+            cur.execute("SELECT data::text FROM geo_location WHERE ord IS NOT NULL ORDER BY data->>'region', ord")
+            # Decimal keeps the JSON text exact, as data->>'lat_min' does
+            geo_rows = [json.loads(row[0], parse_float=Decimal) for row in cur.fetchall()]
+        for lt in tables.locales.values():
+            lt.phone_patterns = [p for locale, p in phone_patterns if locale is None or locale == lt.locale]
+        tables.set_geo(geo_rows)
+        tables.freeze()
+        return tables
+
+    def set_geo(self, rows):
+        for i, row in enumerate(rows):
+            first, count = self.geo_index.get(row["region"], (i, 0))
+            self.geo_index[row["region"]] = (first, count + 1)
+
+        def column(name):
+            return np.array([float(Decimal(row[name])) for row in rows])
+
+        def span(low, high):
+            # (max)::numeric - (min)::numeric is exact, then widened to double
+            return np.array([float(Decimal(row[high]) - Decimal(row[low])) for row in rows])
+
+        self.geo = {
+            "lat_min": column("lat_min"), "lat_span": span("lat_min", "lat_max"),
+            "lon_min": column("lon_min"), "lon_span": span("lon_min", "lon_max"),
+        }
+
+    def freeze(self):
+        # Lists -> arrays so picks are vectorized gathers
+        for lt in self.locales.values():
+            lt.first_names = {g: np.array([n[0] for n in rows], dtype=object) for g, rows in lt.names.items()}
+            lt.last_names = {g: np.array([n[1] for n in rows], dtype=object) for g, rows in lt.names.items()}
+            lt.titles = {g: np.array(rows, dtype=object) for g, rows in lt.titles.items()}
+            name_key = "city" if lt.locale == "de_DE" else "state"
+            lt.region_names = np.array([r.get(name_key) for r in lt.regions], dtype=object)
+            lt.zip_prefixes = np.array([r.get("zip_prefix") for r in lt.regions], dtype=object)
+            lt.area_codes = np.array([r.get("area_code") for r in lt.regions], dtype=object)
+            spans = [self.geo_index.get(name, (0, 0)) for name in lt.region_names]
+            lt.geo_first = np.array([first for first, _ in spans], dtype=np.int64)
+            lt.geo_count = np.array([count for _, count in spans], dtype=np.int64)
+            for table in ["eye_colors", "email_domains", "suffixes", "words", "phone_patterns"]:
+                setattr(lt, table, np.array(getattr(lt, table), dtype=object))
+        self.email_patterns = np.array(self.email_patterns, dtype=object)
+
+
+def user_hashes(locale, seed, batch, start, count):
+    # det_rand(locale, seed, batch, i) and pick_hash(seed, batch, i) for a range
+    md5 = hashlib.md5
+    prefix = f"{locale}{seed}{batch}".encode()
+    indexes = range(start, start + count)
+    rand_bytes = [md5(b"%s%d" % (prefix, i)).digest()[:4] for i in indexes]
+    keys = [b"%d:%d:%d" % (seed, batch, i) for i in indexes]
+    lane_bytes = [md5(k).digest() + md5(k + b"#1").digest() + md5(k + b"#2").digest() for k in keys]
+    r = np.frombuffer(b"".join(rand_bytes), dtype=">i4").astype(np.float64) / INT32_SCALE
+    lanes = np.frombuffer(b"".join(lane_bytes), dtype=">u4").reshape(count, LANES).astype(np.int64)
+    return r, lanes
+
+
+def pick(values, lane):
+    if len(values) == 0:
+        return np.full(len(lane), None, dtype=object)
+    return values[lane % len(values)]
+
+
+def weighted_pick(values, alias, lane, coin):
+    # Alias-method draw: column lane % n, kept when coin < cut, else its alias
+    if alias is None or len(values) == 0:
+        return pick(values, lane)
+    cut, other = alias
+    column = lane % len(values)
+    return values[np.where(coin < cut[column], column, other[column])]
+
+
+def generate_columns(tables, locale, seed, batch, start, count):
+    """One list per output field for users start .. start + count - 1."""
+    lt = tables.locales[locale]
+    idx = np.arange(start, start + count)
+    r, lanes = user_hashes(locale, seed, batch, start, count)
+    male = (seed + batch + idx) % 2 == 0
+    gender = np.where(male, "male", "female").astype(object)
+
+    first = np.empty(count, dtype=object)
+    last = np.empty(count, dtype=object)
+    title = np.empty(count, dtype=object)
+    height_mean = np.full(count, np.nan)
+    weight_mean = np.full(count, np.nan)
+    for g, mask in [("male", male), ("female", ~male)]:
+        first[mask] = pick(lt.first_names.get(g, np.array([], dtype=object)), lanes[mask, NAME])
+        last[mask] = pick(lt.last_names.get(g, np.array([], dtype=object)), lanes[mask, NAME])
+        title[mask] = pick(lt.titles.get(g, np.array([], dtype=object)), lanes[mask, TITLE])
+        if g in lt.physical:
+            height_mean[mask], weight_mean[mask] = lt.physical[g]
+
+    region_ord = lanes[:, REGION] % max(len(lt.region_names), 1)
+    region_name = lt.region_names[region_ord] if len(lt.region_names) else np.full(count, None, dtype=object)
+    zip_prefix = lt.zip_prefixes[region_ord] if len(lt.zip_prefixes) else region_name
+    area_code = lt.area_codes[region_ord] if len(lt.area_codes) else region_name
+
+    # Box-Muller, in the SQL's operand order
+    u1 = np.minimum(np.maximum(r, U_MIN), U_MAX)
+    u2 = (u1 + 0.5) - np.floor(u1 + 0.5)
+    radius = np.sqrt(-2 * np.log(u1))
+    angle = np.cos(2 * np.pi * u2)
+    spread = 13 if locale == "en_US" else 9
+    height = np.rint(np.maximum(height_mean + 5 * radius * angle, 160))
+    weight = np.rint(np.maximum(weight_mean + spread * radius * angle, 50))
+
+    # geo row: ord = lane % rows in the region
+    geo_first = lt.geo_first[region_ord] if len(lt.geo_first) else np.zeros(count, dtype=np.int64)
+    geo_count = lt.geo_count[region_ord] if len(lt.geo_count) else np.zeros(count, dtype=np.int64)
+    has_geo = geo_count > 0
+    row = geo_first + np.where(has_geo, lanes[:, LOCATION] % np.maximum(geo_count, 1), 0)
+    geo = tables.geo
+    lat = np.where(has_geo, geo["lat_min"][row] + r * geo["lat_span"][row], np.nan)
+    lon = np.where(has_geo, geo["lon_min"][row] + r * geo["lon_span"][row], np.nan)
+
+    eye = weighted_pick(lt.eye_colors, lt.alias.get("eye_colors"), lanes[:, EYE], lanes[:, EYE_COIN])
+    domain = weighted_pick(lt.email_domains, lt.alias.get("email_domains"), lanes[:, DOMAIN], lanes[:, DOMAIN_COIN])
+    email_pattern = pick(tables.email_patterns, lanes[:, EMAIL_PATTERN])
+    phone_pattern = pick(lt.phone_patterns, lanes[:, PHONE_PATTERN])
+    suffix = pick(lt.suffixes, lanes[:, SUFFIX])
+    word = pick(lt.words, lanes[:, WORD])
+
+    # r lies in [-0.5, 0.5] and u1, u2 in [0, 1), so the digit strings are table lookups
+    random3 = RANDOM3[floor_int(r * 1000) + 500]
+    subscriber = np.strings.zfill(floor_int(u2 * 1000000).astype(np.dtypes.StringDType()), 6).tolist()
+    street_digits = STREET3[floor_int(u1 * 1000)] if locale == "en_US" else STREET4[floor_int(u1 * 10000)]
+    intl = "+1" if locale == "en_US" else "+49"
+
+    full_name = [
+        None if f is None or l is None
+        else (f"{t} {f} {l}" if t is not None else None) if high else f"{f} {l}"
+        for f, l, t, high in zip(first.tolist(), last.tolist(), title.tolist(), (r > 0.6).tolist())
+    ]
+    email = [
+        None if f is None or l is None
+        else p.replace("{first}", f).replace("{last}", l).replace("{f}", f[:1]).replace("{l}", l[:1])
+        .replace("{domain}", d).replace("{random}", n)
+        for p, f, l, d, n in zip(email_pattern.tolist(), first.tolist(), last.tolist(),
+                                 domain.tolist(), random3.tolist())
+    ]
+    phone = [
+        p.replace("{intl}", intl).replace("{area}", a).replace("{subscriber}", n)
+        for p, a, n in zip(phone_pattern.tolist(), area_code.tolist(), subscriber)
+    ]
+    address = [
+        f"{w} {x}, {z}-{n}"
+        for w, x, z, n in zip(word.tolist(), suffix.tolist(), zip_prefix.tolist(), street_digits.tolist())
+    ]
+
+    return {
+        "full_name": full_name,
+        "gender": gender.tolist(),
+        "eye_color": eye.tolist(),
+        "height": [None if h != h else int(h) for h in height.tolist()],
+        "weight": [None if w != w else int(w) for w in weight.tolist()],
+        "email": email,
+        "phone": phone,
+        "address": address,
+        "lat": numeric6(lat),
+        "lon": numeric6(lon),
+        "region": region_name.tolist(),
+    }
+
+
+def generate_users(tables, locale, seed, batch, start, count):
+    # Same dicts as psycopg2 returns for generate_fake_users(..., 2)
+    columns = generate_columns(tables, locale, seed, batch, start, count)
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def parity(conn, tables, locale, seed, batch, start, count):
+    """Indexes where the engine and generate_fake_users(..., 2) disagree."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT idx, fake_user FROM generate_fake_users(%s, %s, %s, %s, %s, 2)",
+                    (locale, seed, batch, start, count))
+        expected = cur.fetchall()
+    users = generate_users(tables, locale, seed, batch, start, count)
+    return [idx for (idx, sql_user), user in zip(expected, users) if sql_user != user]
+
+
+if __name__ == "__main__":
+    # python engine.py [count]: throughput; parity with SQL is checked by test_engine.py
+    from urllib.parse import urlparse
+    import os
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    result = urlparse(os.environ.get('DATABASE_URL'))
+    conn = psycopg2.connect(host=result.hostname, port=result.port, database=result.path[1:],
+                            user=result.username, password=result.password)
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    start_time = time.time()
+    tables = LookupTables.from_db(conn)
+    print(f"Loaded lookup tables in {time.time() - start_time:.2f} seconds")
+    for name, func in [("columns", generate_columns), ("dicts", generate_users)]:
+        start_time = time.time()
+        func(tables, "en_US", 1, 1, 0, count)
+        elapsed = time.time() - start_time
+        print(f"{name:>8}: {count} users in {elapsed:.2f} seconds ({count / elapsed:.0f} users/sec)")
@@ -0,0 +1,186 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+import psycopg2
+from dotenv import load_dotenv
+import db
+import engine
+
+# Bulk export of users start .. start + count - 1 of one (locale, seed, batch)
+# as CSV, NDJSON or Parquet. Users are produced CHUNK_SIZE at a time, either
+# in-process by engine.py or by one generate_fake_users() call per chunk, and
+# each chunk is encoded and handed on before the next one is made, so memory
+# stays flat however many users are exported.
+
+FIELDS = ["full_name", "gender", "eye_color", "height", "weight", "email", "phone", "address", "lat", "lon",
+          "region"]
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson", "parquet": "application/vnd.apache.parquet"}
+SOURCES = ["numpy", "sql"]
+CHUNK_SIZE = 10000
+
+
+def numpy_chunks(tables, locale, seed, batch, start, count, chunk_size=CHUNK_SIZE):
+    for offset in range(start, start + count, chunk_size):
+        yield engine.generate_columns(tables, locale, seed, batch, offset, min(chunk_size, start + count - offset))
+
+
+def sql_chunks(conn, locale, seed, batch, start, count, chunk_size=CHUNK_SIZE, version=1):
+    with conn.cursor() as cur:
+        for offset in range(start, start + count, chunk_size):
+            cur.execute("SELECT fake_user FROM generate_fake_users(%s, %s, %s, %s, %s, %s);",
+                        (locale, seed, batch, offset, min(chunk_size, start + count - offset), version))
+            users = [row[0] for row in cur.fetchall()]
+            yield {field: [u.get(field) for u in users] for field in FIELDS}
+
+
+def csv_stream(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerow(FIELDS)
+    for columns in chunks:
+        writer.writerows(zip(*(columns[field] for field in FIELDS)))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def ndjson_stream(chunks):
+    dumps = json.JSONEncoder(ensure_ascii=False).encode
+    for columns in chunks:
+        rows = zip(*(columns[field] for field in FIELDS))
+        yield "".join(dumps(dict(zip(FIELDS, row))) + "\n" for row in rows).encode()
+
+
+class _Drain:
+    # Append-only sink for ParquetWriter; take() hands over what was written so far
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def parquet_stream(chunks):
+    # One row group per chunk; the footer goes out after the last one
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(field, pa.int64() if field in ("height", "weight") else
+                         pa.float64() if field in ("lat", "lon") else pa.string()) for field in FIELDS])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    for columns in chunks:
+        writer.write_table(pa.table({field: columns[field] for field in FIELDS}, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def stream(chunks, fmt):
+    if fmt == "csv":
+        return csv_stream(chunks)
+    if fmt == "ndjson":
+        return ndjson_stream(chunks)
+    if fmt == "parquet":
+        return parquet_stream(chunks)
+    raise ValueError(f"unknown export format {fmt!r}, expected one of {list(FORMATS)}")
+
+
+class Meter:
+    """Counts bytes passing through an export stream and times it."""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.bytes = 0
+        self.start_time = None
+        self.elapsed = 0.0
+
+    def __iter__(self):
+        self.start_time = time.perf_counter()
+        for part in self.parts:
+            self.bytes += len(part)
+            yield part
+        self.elapsed = time.perf_counter() - self.start_time
+
+    def summary(self, count):
+        elapsed = max(self.elapsed, 1e-9)
+        return (f"{count} users, {self.bytes / 1e6:.1f} MB in {elapsed:.2f} seconds "
+                f"({count / elapsed:.0f} users/sec, {self.bytes / 1e6 / elapsed:.1f} MB/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream fake users to a file as CSV, NDJSON or Parquet")
+    parser.add_argument("--locale", default="en_US")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--start", type=int, default=0)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--format", choices=list(FORMATS), default="csv")
+    parser.add_argument("--source", choices=SOURCES, default=None,
+                        help="numpy only generates version 2 users (default: numpy for version 2, else sql)")
+    parser.add_argument("--version", type=int, default=int(os.environ.get("FAKE_USER_VERSION", 1)),
+                        help="generator version, as FAKE_USER_VERSION in main.py")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="generate chunks in this many processes")
+    parser.add_argument("-o", "--output", help="output file, stdout when omitted")
+    args = parser.parse_args()
+    if args.source is None:
+        args.source = "numpy" if args.version == 2 else "sql"
+    if args.source == "numpy" and args.version != 2:
+        parser.error("--source numpy only generates version 2 users")
+
+    load_dotenv()
+    # Workers open their own connections; the parent only needs one single-process
+    conn = pool = None
+    if args.workers > 1:
+        import parallel
+        pool = parallel.executor(args.workers, args.source)
+        chunks = parallel.parallel_chunks(pool, args.workers, args.locale, args.seed, args.batch, args.start,
+                                          args.count, args.chunk_size, args.version)
+    else:
+        conn = psycopg2.connect(**db.connect_args())
+        if args.source == "numpy":
+            chunks = numpy_chunks(engine.LookupTables.from_db(conn), args.locale, args.seed, args.batch,
+                                  args.start, args.count, args.chunk_size)
+        else:
+            chunks = sql_chunks(conn, args.locale, args.seed, args.batch, args.start, args.count,
+                                args.chunk_size, args.version)
+    meter = Meter(stream(chunks, args.format))
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for part in meter:
+            out.write(part)
+    finally:
+        if args.output:
+            out.close()
+        if pool:
+            pool.shutdown()
+        if conn:
+            conn.close()
+    print(meter.summary(args.count), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,19 @@
 from faker import Faker
 from dotenv import load_dotenv
+import csv
+import io
 import os
+import sys
+import time
 from urllib.parse import urlparse
 import psycopg2
 import json
 
+# People per locale and gender; python load.py 20000 loads a 100x pool
+NAMES_PER_GENDER = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.environ.get('NAMES_PER_GENDER', 200))
+# Faker is seeded so re-running the load gives the same rows, ids and users
+FAKER_SEED = 0
+
 load_dotenv()
 db_url = os.environ.get('DATABASE_URL')
 result = urlparse(db_url)
@@ -17,56 +26,56 @@ conn = psycopg2.connect(
 )
 cur = conn.cursor()
 # Creating Lookup Tables
-names = """create table names(
+names = """create table if not exists names(
 id serial primary key,
 locale text,
 first_name text,
 last_name text,
 gender text)
 """
-titles = """create table titles(
+titles = """create table if not exists titles(
 id serial primary key,
 title text,
 locale text,
 gender text)"""
-address_suf = """create table suffixes(
+address_suf = """create table if not exists suffixes(
 id serial primary key,
 locale text,
 suffix text
 )"""
-address_region = """create table regions(
+address_region = """create table if not exists regions(
 id serial primary key,
 locale text,
 data json
 )"""
-address_words = """create table words(
+address_words = """create table if not exists words(
 id serial primary key,
 locale text,
 word text)"""
-physical_attributes = """create table physical_attributes(
+physical_attributes = """create table if not exists physical_attributes(
 id serial primary key,
 height real,
 weight real,
 gender text,
 locale text)"""
-eye_color = """create table eye_colors(
+eye_color = """create table if not exists eye_colors(
 id serial primary key,
 locale text,
 eye_color text,
 probability real
 )"""
-email_domains = """create table email_domains(
+email_domains = """create table if not exists email_domains(
 id serial primary key,
 locale text,
 domain text,
 probability real)"""
-email_pattern = """create table email_patterns(
+email_pattern = """create table if not exists email_patterns(
 id serial primary key,
 pattern text)"""
-geo_location = """create table geo_location(
+geo_location = """create table if not exists geo_location(
 id serial primary key,
 data json)"""
-phone_number_patterns = """create table phone_number_patterns(
+phone_number_patterns = """create table if not exists phone_number_patterns(
 id serial primary key,
 pattern text,
 locale text)"""
@@ -79,83 +88,88 @@ try:
 except Exception as e:
     print("Error:",e)
 print("Tables created")
-# insert data
-sql_patterns = {
-    "names": """
-        INSERT INTO names (locale, first_name, last_name, gender)
-        VALUES (%s, %s, %s, %s)
-    """,
-    "titles": """
-        INSERT INTO titles (title, locale,gender)
-        VALUES (%s, %s,%s)
-    """,
-    "suffixes": """
-        INSERT INTO suffixes (locale, suffix)
-        VALUES (%s, %s)
-    """,
-    "regions": """
-        INSERT INTO regions (locale,data)
-        VALUES (%s, %s)
-    """,
-    "words": """
-        INSERT INTO words (locale, word)
-        VALUES (%s, %s)
-    """,
-    "physical_attributes": """
-        INSERT INTO physical_attributes (height, weight, gender, locale)
-        VALUES (%s, %s, %s, %s)
-    """,
-    "eye_colors": """
-        INSERT INTO eye_colors (locale, eye_color, probability)
-        VALUES (%s, %s, %s)
-    """,
-    "email_domains": """
-        INSERT INTO email_domains (locale, domain, probability)
-        VALUES (%s, %s, %s)
-    """,
-    "email_patterns": """
-        INSERT INTO email_patterns (pattern)
-        VALUES (%s)
-    """,
-    "phone_number_patterns": """
-        INSERT INTO phone_number_patterns (pattern,locale)
-        VALUES (%s,%s)
-    """,
-    "geo_location": """
-        INSERT INTO geo_location (data)
-        VALUES (%s)
-    """
+# Every lookup table is rebuilt in memory, then truncated and streamed with COPY
+columns = {
+    "names": ["locale", "first_name", "last_name", "gender"],
+    "titles": ["title", "locale", "gender"],
+    "suffixes": ["locale", "suffix"],
+    "regions": ["locale", "data"],
+    "words": ["locale", "word"],
+    "physical_attributes": ["height", "weight", "gender", "locale"],
+    "eye_colors": ["locale", "eye_color", "probability"],
+    "email_domains": ["locale", "domain", "probability"],
+    "email_patterns": ["pattern"],
+    "phone_number_patterns": ["pattern", "locale"],
+    "geo_location": ["data"],
+}
+rows = {table: [] for table in columns}
+# Indexes on what the generator functions filter on; dropped during the load
+# and built once the rows are in
+indexes = {
+    "names_locale_gender_idx": "names (locale, gender)",
+    "titles_locale_gender_idx": "titles (locale, gender)",
+    "suffixes_locale_idx": "suffixes (locale)",
+    "regions_locale_idx": "regions (locale)",
+    "words_locale_idx": "words (locale)",
+    "physical_attributes_locale_gender_idx": "physical_attributes (locale, gender)",
+    "eye_colors_locale_idx": "eye_colors (locale)",
+    "email_domains_locale_idx": "email_domains (locale)",
+    "phone_number_patterns_locale_idx": "phone_number_patterns (locale)",
+    "geo_location_region_idx": "geo_location ((data->>'region'))",
 }
+
+
+def copy_rows(table, table_rows):
+    # CSV over COPY FROM STDIN; None becomes an unquoted empty field, i.e. NULL
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(table_rows)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns[table])}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
 locales = ["en_US", "de_DE"]
 
 try:
-    def generate_unique_names(generator, count):
-        names = set()
-        while len(names) < count:
-            names.add(generator())
-        return list(names)
-
+    start_time = time.time()
 
-    def generate_people(locale):
+    def faker(locale):
         fake = Faker(locale)
-        male_first = generate_unique_names(fake.first_name_male, 200)
-        female_first = generate_unique_names(fake.first_name_female, 200)
-        surnames = generate_unique_names(fake.last_name, 400)
-        male_surnames = surnames[:200]
-        female_surnames = surnames[200:]
-        male_people = list(zip(male_first, male_surnames))
-        female_people = list(zip(female_first, female_surnames))
+        fake.seed_instance(FAKER_SEED)
+        return fake
+
+
+    def generate_unique(generator, count):
+        # dict keeps first-seen order, so a seeded Faker gives the same list every run
+        values = {}
+        while len(values) < count:
+            values[generator()] = None
+        return list(values)
 
-        return male_people, female_people
+
+    def generate_people(locale, count):
+        # Unique (first, last) pairs: Faker has far fewer distinct first names
+        # than a 100x pool needs. Names are drawn in bulk from the person
+        # provider's weighted lists, as first_name_male() draws them one by one.
+        fake = faker(locale)
+        person = next(p for p in fake.get_providers() if hasattr(p, 'first_names_male'))
+
+        def people(first_names):
+            pairs = {}
+            while len(pairs) < count:
+                need = count - len(pairs)
+                firsts = fake.random_elements(first_names, length=need, use_weighting=True)
+                lasts = fake.random_elements(person.last_names, length=need, use_weighting=True)
+                pairs.update(dict.fromkeys(zip(firsts, lasts)))
+            return list(pairs)[:count]
+
+        return people(person.first_names_male), people(person.first_names_female)
 
 
     for locale in locales:
-        male_people, female_people = generate_people(locale)
-        for first_name, last_name in male_people:
-            cur.execute(sql_patterns['names'], (locale, first_name, last_name, 'male'))
-        for first_name, last_name in female_people:
-            cur.execute(sql_patterns['names'], (locale, first_name, last_name, 'female'))
-    print("Names inserted!")
+        male_people, female_people = generate_people(locale, NAMES_PER_GENDER)
+        rows['names'] += [(locale, first_name, last_name, 'male') for first_name, last_name in male_people]
+        rows['names'] += [(locale, first_name, last_name, 'female') for first_name, last_name in female_people]
+    print("Names generated")
     # titles
     titles_by_locale_gender = {
         "en_US": {
@@ -170,39 +184,29 @@ try:
     for locale, genders in titles_by_locale_gender.items():
         for gender, titles in genders.items():
             for title in titles:
-                cur.execute(sql_patterns['titles'], (title, locale, gender))
-    print("Titles inserted")
+                rows['titles'].append((title, locale, gender))
     # address suffixes
     def street_suffix_us():
-        fake = Faker('en_US')
-        suffix = set()
-        while len(suffix) < 15:
-            suffix.add(fake.street_suffix())
-        return list(suffix)
+        return generate_unique(faker('en_US').street_suffix, 15)
 
 
-    us_suffix = street_suffix_us()
-    for s in us_suffix:
-        cur.execute(sql_patterns['suffixes'], ('en_US', s))
-    cur.execute(sql_patterns['suffixes'], ('de_DE', 'Street'))
-    print("Suffixes inserted")
+    rows['suffixes'] += [('en_US', s) for s in street_suffix_us()]
+    rows['suffixes'].append(('de_DE', 'Street'))
     with open("germany_regions.json") as g:
         g_data=json.load(g)
     with open("us_states.json") as us:
         us_data=json.load(us)
     us_rows_region = [("en_US",json.dumps(item)) for item in us_data]
     de_rows_region = [('de_DE',json.dumps(item)) for item in g_data]
-    cur.executemany(sql_patterns['regions'], us_rows_region)
-    cur.executemany(sql_patterns['regions'], de_rows_region)
-    print("Regions Inserted")
+    rows['regions'] += us_rows_region + de_rows_region
     def generate_address_words(locale, count=50):
-        fake = Faker(locale)
-        words_set = set()
+        fake = faker(locale)
+        words_set = {}
         while len(words_set) < count:
             name = fake.street_name()
             for w in name.replace("-", " ").split():
                 if len(words_set) < count:
-                    words_set.add(w)
+                    words_set[w] = None
                 else:
                     break
         return list(words_set)
@@ -210,16 +214,14 @@ try:
 
     for locale in locales:
         words = generate_address_words(locale, count=50)
-        for w in words:
-            cur.execute(sql_patterns['words'], (locale, w))
-    print("Words inserted")
+        rows['words'] += [(locale, w) for w in words]
     physical_summary = [
         (175, 88, 'male', 'en_US'),
         (162, 75, 'female', 'en_US'),
         (180, 85, 'male', 'de_DE'),
         (165, 70, 'female', 'de_DE')
     ]
-    cur.executemany(sql_patterns['physical_attributes'], physical_summary)
+    rows['physical_attributes'] += physical_summary
     eye_colors = {
         "en_US": [
             ("Brown", 0.55),
@@ -235,9 +237,8 @@ try:
         ]
     }
     for locale, colors in eye_colors.items():
-        cur.executemany(sql_patterns['eye_colors'], [(locale, color, prob) for color, prob in colors])
+        rows['eye_colors'] += [(locale, color, prob) for color, prob in colors]
 
-    print("Physical Attr Inserted")
     email_domains_data = {
         "de_DE": [
             ("gmx.de", 27.34), ("web.de", 26.44), ("t-online.de", 11.63),
@@ -253,7 +254,7 @@ try:
     }
 
     for locale, domains in email_domains_data.items():
-        cur.executemany(sql_patterns['email_domains'], [(locale, domain, prob) for domain, prob in domains])
+        rows['email_domains'] += [(locale, domain, prob) for domain, prob in domains]
 
     email_patterns = [
         "{first}.{last}@{domain}",
@@ -263,7 +264,7 @@ try:
         "{first}{random}@{domain}",
         "{first}_{last}@{domain}"
     ]
-    cur.executemany(sql_patterns['email_patterns'], [(p,) for p in email_patterns])
+    rows['email_patterns'] += [(p,) for p in email_patterns]
     phone_patterns = [
         ("{intl} ({area}) {subscriber}", None),
         ("({area}) {subscriber}", None),
@@ -272,15 +273,35 @@ try:
         ("{intl}-{area}-{subscriber}", None),
         ("0{area} {subscriber}", "de_DE")
     ]
-    cur.executemany(sql_patterns['phone_number_patterns'], phone_patterns)
-    print("Emails Inserted")
+    rows['phone_number_patterns'] += phone_patterns
     with open("geo_locations.json") as f:
         geo_data = json.load(f)
-    rows = [(json.dumps(item),) for item in geo_data]
-    cur.executemany(sql_patterns['geo_location'], rows)
+    rows['geo_location'] += [(json.dumps(item),) for item in geo_data]
+    print(f"Lookup rows built in {time.time() - start_time:.2f} seconds")
+
+    # Re-running replaces the data: same rows, ids restart from 1
+    start_time = time.time()
+    cur.execute(f"TRUNCATE {', '.join(columns)} RESTART IDENTITY;")
+    for index in indexes:
+        cur.execute(f"DROP INDEX IF EXISTS {index};")
+    for table, table_rows in rows.items():
+        copy_rows(table, table_rows)
+    for index, target in indexes.items():
+        cur.execute(f"CREATE INDEX {index} ON {target};")
+    # Renumber the lookups and bump the version stamp the app's page cache checks
+    cur.execute("SELECT to_regproc('refresh_lookup_ordinals') IS NOT NULL;")
+    if cur.fetchone()[0]:
+        cur.execute("SELECT refresh_lookup_ordinals();")
+    conn.commit()
+    # ANALYZE after the renumbering so the planner sees the final tables
+    for table in columns:
+        cur.execute(f"ANALYZE {table};")
+    conn.commit()
+    print(f"Loaded {sum(map(len, rows.values()))} rows in {time.time() - start_time:.2f} seconds")
 except Exception as e:
     conn.rollback()
+    print("Failed", e, file=sys.stderr)
+    raise
 finally:
-    conn.commit()
     cur.close()
     conn.close()
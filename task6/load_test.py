@@ -0,0 +1,81 @@
+import argparse
+import logging
+import threading
+import time
+import urllib.request
+from werkzeug.serving import make_server
+import db
+import main
+
+# Threaded dev server over main.app, hammered by N client threads per run;
+# reports requests/sec, latency and the pool's own counters
+
+
+def serve():
+    server = make_server("127.0.0.1", 0, main.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_clients(url, clients, seconds):
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client(worker):
+        page = 1
+        while time.monotonic() < stop_at:
+            start_time = time.perf_counter()
+            try:
+                with urllib.request.urlopen(f"{url}&seed={worker}&page={page}") as response:
+                    response.read()
+            except OSError as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start_time)
+            page += 1
+
+    threads = [threading.Thread(target=client, args=(worker,)) for worker in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors
+
+
+def main_():
+    parser = argparse.ArgumentParser(description="Load test the task6 app against a local Postgres")
+    parser.add_argument("--clients", default="1,2,4,8,16", help="comma-separated concurrent client counts")
+    parser.add_argument("--pool-sizes", default="1,8", help="comma-separated DB_POOL_MAX values to compare")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--locale", default="en_US")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = serve()
+    url = f"http://127.0.0.1:{server.server_port}/api/users?Locale={args.locale}&page_size={args.page_size}"
+    for pool_size in [int(n) for n in args.pool_sizes.split(",")]:
+        main.pool.close()
+        main.pool = db.Pool(minconn=pool_size, maxconn=pool_size)
+        print(f"pool of {pool_size}")
+        for clients in [int(n) for n in args.clients.split(",")]:
+            before = main.pool.metrics()
+            latencies, errors = run_clients(url, clients, args.seconds)
+            metrics = main.pool.metrics()
+            checkouts = metrics['checkouts'] - before['checkouts']
+            wait = (metrics['wait_seconds'] - before['wait_seconds']) * 1000 / max(checkouts, 1)
+            done = len(latencies)
+            median = latencies[done // 2] * 1000 if done else float("nan")
+            p95 = latencies[int(done * 0.95)] * 1000 if done else float("nan")
+            print(f"  {clients:>3} clients: {done / args.seconds:8.1f} req/s, median {median:.1f} ms, "
+                  f"p95 {p95:.1f} ms, errors {len(errors)}, pool size {metrics['size']}, "
+                  f"mean pool wait {wait:.2f} ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main_()
@@ -1,39 +1,103 @@
 import folium
 from folium import Map, Marker
-from flask import Flask, render_template, request
-import psycopg2
-from urllib.parse import urlparse
+from flask import Flask, Response, abort, g, jsonify, render_template, request, stream_with_context
 import os
+import threading
+import time
 from dotenv import load_dotenv
+import db
+import engine
+import export
+import page_cache
 
 
 load_dotenv()
 app = Flask(__name__)
 
-db_url = os.environ.get('DATABASE_URL')
-result = urlparse(db_url)
-conn = psycopg2.connect(
-    host=result.hostname,
-    port=result.port,
-    database=result.path[1:],
-    user=result.username,
-    password=result.password
-)
-cur = conn.cursor()
-
-BATCH_SIZE = 10
-
-def generate_fake_users(locale, seed, batch_number):
-    users = []
-    start_index = (batch_number - 1) * BATCH_SIZE
-    for i in range(BATCH_SIZE):
-        p_index = start_index + i
+# Sized by DB_POOL_MIN / DB_POOL_MAX / DB_POOL_TIMEOUT
+pool = db.Pool.from_env()
+
+BATCH_SIZE = int(os.environ.get('PAGE_SIZE', 10))
+MAX_PAGE_SIZE = 1000
+MAX_EXPORT = int(os.environ.get('MAX_EXPORT', 10000000))
+# "numpy" renders pages in-process from lookup tables read once (same users
+# as generate_fake_users(..., 2) in SQL); "sql" asks Postgres for the page
+ENGINE = os.environ.get('FAKE_USER_ENGINE', 'sql')
+# Generator version: 1 reproduces the original per-user picks, 2 (hash-offset
+# picks) is opt-in and is the only version the numpy engine implements
+VERSION = int(os.environ.get('FAKE_USER_VERSION', 2 if ENGINE == 'numpy' else 1))
+if ENGINE == 'numpy' and VERSION != 2:
+    raise ValueError("FAKE_USER_ENGINE=numpy only generates version 2 users; set FAKE_USER_VERSION=2")
+lookup_tables = None
+lookup_tables_lock = threading.Lock()
+# Generated pages and their maps by (engine, version, locale, seed, page, size);
+# PAGE_CACHE_DIR adds a disk tier that survives restarts
+pages = page_cache.PageCache(int(os.environ.get('PAGE_CACHE_SIZE', 256)), os.environ.get('PAGE_CACHE_DIR'))
+# How often the lookup version stamp is re-read; cache hits in between skip the database
+VERSION_CHECK_SECONDS = float(os.environ.get('LOOKUP_VERSION_CHECK_SECONDS', 5))
+version_checked_at = None
+
+
+def get_db():
+    # One pooled connection per request, returned in release_db
+    if 'db' not in g:
+        g.db = pool.acquire()
+    return g.db
+
+
+@app.teardown_appcontext
+def release_db(error):
+    conn = g.pop('db', None)
+    if conn is not None:
+        pool.release(conn, failed=error is not None)
+
+
+def check_lookup_version():
+    # load.py / refresh_lookup_ordinals bump the stamp; drop everything derived from old lookups
+    global lookup_tables, version_checked_at
+    now = time.monotonic()
+    if version_checked_at is not None and now - version_checked_at < VERSION_CHECK_SECONDS:
+        return
+    with get_db().cursor() as cur:
+        cur.execute("SELECT version FROM lookup_version;")
+        version = cur.fetchone()[0]
+    with lookup_tables_lock:
+        if version != pages.version:
+            pages.set_version(version)
+            lookup_tables = None
+        version_checked_at = now
+
+
+def get_lookup_tables():
+    # Loaded on the request's own connection, taken before the lock, so a
+    # waiting request never holds the lock while it queues for the pool
+    global lookup_tables
+    tables = lookup_tables
+    if tables is None:
+        conn = get_db()
+        with lookup_tables_lock:
+            if lookup_tables is None:
+                lookup_tables = engine.LookupTables.from_db(conn)
+            tables = lookup_tables
+    return tables
+
+
+def generate_fake_users(locale, seed, batch_number, page_size=BATCH_SIZE):
+    start_index = (batch_number - 1) * page_size
+    if ENGINE == 'numpy':
+        return engine.generate_users(get_lookup_tables(), locale, seed, batch_number, start_index, page_size)
+    # The whole page in one round trip
+    with get_db().cursor() as cur:
         cur.execute(
-            "SELECT generate_fake_user(%s, %s, %s, %s);",
-            (locale, seed, batch_number, p_index)
+            "SELECT fake_user FROM generate_fake_users(%s, %s, %s, %s, %s, %s);",
+            (locale, seed, batch_number, start_index, page_size, VERSION)
         )
-        users.append(cur.fetchone()[0])
-    return users
+        return [row[0] for row in cur.fetchall()]
+
+
+def page_args(args):
+    page_size = min(max(int(args.get("page_size", BATCH_SIZE)), 1), MAX_PAGE_SIZE)
+    return args.get("Locale", "en_US"), int(args.get("seed", 1)), int(args.get("page", 1)), page_size
 
 
 def create_map(users):
@@ -55,16 +119,59 @@ def create_map(users):
 
 @app.route("/", methods=["GET", "POST"])
 def index():
-    locale = "en_US"
-    seed = 1
-    page = 1
-    if request.method == "POST":
-        locale = request.form.get("Locale")
-        seed = int(request.form.get("seed"))
-        page = int(request.form.get("page", 1))
-    users = generate_fake_users(locale, seed, page)
-    map_html = create_map(users)
-    return render_template("index.html", users=users, locale=locale, seed=seed, page=page,map_html=map_html)
+    locale, seed, page, page_size = page_args(request.form)
+    check_lookup_version()
+    key = (ENGINE, VERSION, locale, seed, page, page_size)
+    cached = pages.get(key)
+    if cached is None:
+        users = generate_fake_users(locale, seed, page, page_size)
+        map_html = create_map(users)
+        html = render_template("index.html", users=users, locale=locale, seed=seed, page=page,
+                               page_size=page_size, map_html=map_html)
+        cached = {"users": users, "map_html": map_html, "html": html}
+        pages.put(key, cached)
+    return cached["html"]
+
+
+@app.route("/api/users")
+def api_users():
+    locale, seed, page, page_size = page_args(request.args)
+    check_lookup_version()
+    return jsonify(generate_fake_users(locale, seed, page, page_size))
+
+
+@app.route("/export")
+def export_users():
+    # /export?locale=en_US&seed=1&count=1000000&format=csv[&batch=1&start=0&source=numpy]
+    fmt = request.args.get("format", "csv")
+    source = request.args.get("source", "numpy" if ENGINE == "numpy" else "sql")
+    # The numpy engine only produces version 2 users
+    if fmt not in export.FORMATS or source not in export.SOURCES or (source == "numpy" and VERSION != 2):
+        abort(400)
+    locale = request.args.get("locale", "en_US")
+    seed = int(request.args.get("seed", 1))
+    batch = int(request.args.get("batch", 1))
+    start = int(request.args.get("start", 0))
+    count = min(max(int(request.args.get("count", 1000)), 0), MAX_EXPORT)
+    check_lookup_version()
+    if source == "numpy":
+        chunks = export.numpy_chunks(get_lookup_tables(), locale, seed, batch, start, count)
+    else:
+        chunks = export.sql_chunks(get_db(), locale, seed, batch, start, count, version=VERSION)
+    meter = export.Meter(export.stream(chunks, fmt))
+
+    def body():
+        yield from meter
+        app.logger.info("export %s %s seed=%s: %s", fmt, locale, seed, meter.summary(count))
+
+    filename = f"users_{locale}_{seed}_{batch}_{start}_{count}.{fmt}"
+    return Response(stream_with_context(body()), mimetype=export.FORMATS[fmt],
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+
+@app.route("/metrics")
+def metrics():
+    return jsonify(pool=pool.metrics(), page_cache=pages.info())
 
 
 if __name__ == "__main__":
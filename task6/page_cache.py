@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+
+class PageCache:
+    """LRU cache of generated pages with an optional on-disk tier.
+
+    Pages are fully determined by their key, so entries only go stale when the
+    lookup tables change. Every entry belongs to one lookup version stamp
+    (bumped by refresh_lookup_ordinals); set_version() with a new stamp drops
+    the memory tier and every other version's directory on disk.
+    """
+
+    def __init__(self, max_pages=256, directory=None):
+        self.max_pages = max_pages
+        self.directory = directory
+        self.version = None
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        name = hashlib.blake2b(json.dumps(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"v{self.version}", f"{name}.json")
+
+    def set_version(self, version):
+        with self._lock:
+            if version == self.version:
+                return
+            self.version = version
+            self._pages.clear()
+            if self.directory and os.path.isdir(self.directory):
+                for entry in os.listdir(self.directory):
+                    if entry != f"v{version}":
+                        shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+
+    def get(self, key):
+        with self._lock:
+            value = self._pages.get(key)
+            if value is not None:
+                self._pages.move_to_end(key)
+                self.hits += 1
+                return value
+            if self.directory:
+                try:
+                    with open(self._path(key)) as f:
+                        value = json.load(f)
+                except (OSError, ValueError):
+                    value = None
+                if value is not None:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                    return value
+            self.misses += 1
+            return None
+
+    def _remember(self, key, value):
+        self._pages[key] = value
+        if len(self._pages) > self.max_pages:
+            self._pages.popitem(last=False)
+
+    def put(self, key, value):
+        # value must be JSON-serialisable for the disk tier
+        with self._lock:
+            self._remember(key, value)
+            if self.directory:
+                path = self._path(key)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp = f"{path}.{threading.get_ident()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(value, f)
+                os.replace(tmp, path)
+
+    def info(self):
+        return {
+            "version": self.version,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "pages": len(self._pages),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            if self.directory:
+                shutil.rmtree(self.directory, ignore_errors=True)
+            self.hits = self.disk_hits = self.misses = 0
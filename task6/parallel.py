@@ -0,0 +1,104 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import psycopg2
+from dotenv import load_dotenv
+import db
+import engine
+import export
+
+# Users are independent in (seed, batch, index), so an index range splits into
+# chunks that worker processes generate on their own connection (sql) or their
+# own copy of the lookup tables (numpy). Chunks come back in index order.
+
+_source = None
+_conn = None
+_tables = None
+
+
+def _init_worker(source, db_url):
+    global _source, _conn, _tables
+    _source = source
+    _conn = psycopg2.connect(**db.connect_args(db_url))
+    if source == "numpy":
+        _tables = engine.LookupTables.from_db(_conn)
+
+
+def _generate(task):
+    locale, seed, batch, start, count, version = task
+    if _source == "numpy":
+        return engine.generate_columns(_tables, locale, seed, batch, start, count)
+    return next(export.sql_chunks(_conn, locale, seed, batch, start, count, count, version))
+
+
+def executor(workers, source, db_url=None):
+    method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method),
+                               initializer=_init_worker, initargs=(source, db_url))
+
+
+def parallel_chunks(pool, workers, locale, seed, batch, start, count, chunk_size=export.CHUNK_SIZE, version=1):
+    """Column chunks for users start .. start + count - 1, in order.
+
+    At most 2 * workers chunks are in flight, so a slow consumer holds back
+    generation instead of buffering the whole range.
+    """
+    tasks = ((locale, seed, batch, offset, min(chunk_size, start + count - offset), version)
+             for offset in range(start, start + count, chunk_size))
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(_generate, task))
+        if len(pending) >= 2 * workers:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def scaling(worker_counts, locale, seed, count, source, chunk_size=export.CHUNK_SIZE, version=1):
+    # users/sec per worker count; pool start-up (connect, table load) is not timed
+    results = {}
+    for workers in worker_counts:
+        with executor(workers, source) as pool:
+            # warm every worker before timing
+            list(pool.map(_generate, [(locale, seed, 0, 0, 1, version)] * workers))
+            start_time = time.perf_counter()
+            generated = sum(len(chunk["email"]) for chunk in
+                            parallel_chunks(pool, workers, locale, seed, 1, 0, count, chunk_size, version))
+            elapsed = time.perf_counter() - start_time
+        results[workers] = generated / elapsed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Users/sec of parallel generation at 1..N worker processes")
+    parser.add_argument("--workers", default=None, help="comma-separated worker counts (default 1,2,4.. up to CPUs)")
+    parser.add_argument("--source", choices=export.SOURCES, default="sql")
+    parser.add_argument("--version", type=int, default=int(os.environ.get("FAKE_USER_VERSION", 1)),
+                        help="generator version; the numpy source only generates version 2")
+    parser.add_argument("--locale", default="en_US")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--count", type=int, default=200000)
+    parser.add_argument("--chunk-size", type=int, default=export.CHUNK_SIZE)
+    args = parser.parse_args()
+    if args.source == "numpy" and args.version != 2:
+        parser.error("--source numpy only generates version 2 users")
+
+    load_dotenv()
+    if args.workers:
+        worker_counts = [int(n) for n in args.workers.split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        worker_counts = sorted({min(2 ** i, cpus) for i in range(cpus.bit_length() + 1)})
+    print(f"{args.source} v{args.version}: {args.count} users, chunks of {args.chunk_size}, {os.cpu_count()} CPUs")
+    results = scaling(worker_counts, args.locale, args.seed, args.count, args.source, args.chunk_size,
+                      args.version)
+    base = results[worker_counts[0]]
+    for workers, rate in results.items():
+        print(f"  {workers:>3} workers: {rate:10.0f} users/sec ({rate / base:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -27,23 +27,37 @@ $$ LANGUAGE plpgsql IMMUTABLE;
 """
 
 name = """
-CREATE FUNCTION get_name(p_locale text, p_gender text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_name(p_locale text, p_gender text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS TABLE(fname text, lname text) AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN QUERY
 SELECT n.first_name, n.last_name
 FROM names n
 WHERE n.locale = p_locale AND n.gender = p_gender
 ORDER BY md5(n.first_name || n.last_name || p_seed || p_batch || p_index)
 LIMIT 1;
+ELSE
+o := pick_ord('names', p_locale, p_gender, p_seed, p_batch, p_index, 0);
+RETURN QUERY
+SELECT n.first_name, n.last_name
+FROM names n
+WHERE n.locale = p_locale AND n.gender = p_gender
+AND n.ord = o;
+END IF;
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 title = """
-CREATE FUNCTION pick_title(p_locale text, p_gender text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION pick_title(p_locale text, p_gender text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT title
 FROM titles
@@ -51,14 +65,25 @@ WHERE locale = p_locale AND gender = p_gender
 ORDER BY md5(title || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('titles', p_locale, p_gender, p_seed, p_batch, p_index, 1);
+RETURN (
+SELECT title
+FROM titles
+WHERE locale = p_locale AND gender = p_gender
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 region = """
-CREATE FUNCTION pick_region(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION pick_region(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS json AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT data
 FROM regions
@@ -66,14 +91,25 @@ WHERE locale = p_locale
 ORDER BY md5(data::text || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('regions', p_locale, '', p_seed, p_batch, p_index, 2);
+RETURN (
+SELECT data
+FROM regions
+WHERE locale = p_locale
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 location = """
-CREATE FUNCTION get_location(p_region text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_location(p_region text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS json AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT data
 FROM geo_location
@@ -81,6 +117,14 @@ WHERE data->>'region' = p_region
 ORDER BY md5(data::text || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('geo_location', '', p_region, p_seed, p_batch, p_index, 3);
+RETURN (
+SELECT data
+FROM geo_location
+WHERE data->>'region' = p_region
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
@@ -98,9 +142,12 @@ $$ LANGUAGE plpgsql IMMUTABLE;
 """
 
 eye = """
-CREATE FUNCTION get_eye_color(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_eye_color(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT eye_color
 FROM eye_colors
@@ -108,14 +155,25 @@ WHERE locale = p_locale
 ORDER BY md5(eye_color || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := alias_ord('eye_colors', p_locale, p_seed, p_batch, p_index, 4, 10);
+RETURN (
+SELECT eye_color
+FROM eye_colors
+WHERE locale = p_locale
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 email_domain = """
-CREATE FUNCTION get_email_domain(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_email_domain(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT domain
 FROM email_domains
@@ -123,27 +181,48 @@ WHERE locale = p_locale
 ORDER BY md5(domain || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := alias_ord('email_domains', p_locale, p_seed, p_batch, p_index, 5, 11);
+RETURN (
+SELECT domain
+FROM email_domains
+WHERE locale = p_locale
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;"""
 
 email_pattern = """
-CREATE FUNCTION get_email_pattern(p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_email_pattern(p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT pattern
 FROM email_patterns
 ORDER BY md5(pattern || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('email_patterns', '', '', p_seed, p_batch, p_index, 6);
+RETURN (
+SELECT pattern
+FROM email_patterns
+WHERE ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 phone_pattern = """
-CREATE FUNCTION get_phone_pattern(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_phone_pattern(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT pattern
 FROM phone_number_patterns
@@ -151,14 +230,25 @@ WHERE locale = p_locale OR locale IS NULL
 ORDER BY md5(pattern || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('phone_number_patterns', p_locale, '', p_seed, p_batch, p_index, 7);
+RETURN (
+SELECT pattern
+FROM phone_number_patterns
+WHERE (locale = p_locale OR locale IS NULL)
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
 address_suffix = """
-CREATE FUNCTION address_suf(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION address_suf(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT suffix
 FROM suffixes
@@ -166,13 +256,24 @@ WHERE locale = p_locale
 ORDER BY md5(suffix || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('suffixes', p_locale, '', p_seed, p_batch, p_index, 8);
+RETURN (
+SELECT suffix
+FROM suffixes
+WHERE locale = p_locale
+AND ord = o
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 word="""
-CREATE FUNCTION get_word(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION get_word(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS text AS $$
+DECLARE
+o bigint;
 BEGIN
+IF p_version = 1 THEN
 RETURN (
 SELECT word
 FROM words
@@ -180,15 +281,219 @@ WHERE locale = p_locale
 ORDER BY md5(word || p_seed || p_batch || p_index)
 LIMIT 1
 );
+END IF;
+o := pick_ord('words', p_locale, '', p_seed, p_batch, p_index, 9);
+RETURN (
+SELECT word
+FROM words
+WHERE locale = p_locale
+AND ord = o
+);
+END;
+$$ LANGUAGE plpgsql STABLE;
+"""
+
+
+# Version 2 picks: three md5 digests of (seed, batch, index), read as twelve
+# big-endian 32-bit lanes; lane k picks the row with ord = lane % count from a
+# lookup table numbered by refresh_lookup_ordinals(). Weighted tables then
+# toss a coin on lane 10 (eye colors) or 11 (email domains), see alias_tables.
+ordinal_tables = [
+    # (table, columns the ordinals restart on, lookup_counts locale, lookup_counts part)
+    ("names", "locale, gender", "locale", "gender"),
+    ("titles", "locale, gender", "locale", "gender"),
+    ("regions", "locale", "locale", "''"),
+    ("geo_location", "(data->>'region')", "''", "data->>'region'"),
+    ("eye_colors", "locale", "locale", "''"),
+    ("email_domains", "locale", "locale", "''"),
+    ("email_patterns", "", "''", "''"),
+    ("suffixes", "locale", "locale", "''"),
+    ("words", "locale", "locale", "''"),
+]
+
+
+def numbering_sql(table, partition, count_locale, count_part):
+    over = f"PARTITION BY {partition} ORDER BY id" if partition else "ORDER BY id"
+    index_cols = f"{partition}, ord" if partition else "ord"
+    # The unique index is rebuilt around the renumbering so rows can swap ordinals
+    return f"""
+ALTER TABLE {table} ADD COLUMN IF NOT EXISTS ord int;
+DROP INDEX IF EXISTS {table}_ord_idx;
+UPDATE {table} AS t SET ord = o.ord
+FROM (SELECT id, row_number() OVER ({over}) - 1 AS ord FROM {table}) AS o
+WHERE o.id = t.id AND t.ord IS DISTINCT FROM o.ord;
+CREATE UNIQUE INDEX IF NOT EXISTS {table}_ord_idx ON {table} ({index_cols});
+INSERT INTO lookup_counts
+SELECT '{table}', {count_locale}, {count_part}, count(*) FROM {table}
+WHERE {count_locale} IS NOT NULL AND {count_part} IS NOT NULL
+GROUP BY 2, 3;"""
+
+
+alias_tables = [
+    # (table, weight column) drawn through lookup_alias instead of uniformly
+    ("eye_colors", "probability"),
+    ("email_domains", "probability"),
+]
+
+
+def alias_sql(table, weight):
+    return f"""
+INSERT INTO lookup_alias
+SELECT '{table}', w.locale, a.ord, a.cut, a.alias
+FROM (SELECT locale, array_agg({weight}::numeric ORDER BY ord) AS weights
+FROM {table} WHERE locale IS NOT NULL GROUP BY locale) AS w
+CROSS JOIN LATERAL build_alias(w.weights) AS a;"""
+
+
+# Vose's alias method. Column i keeps its own ord when the draw's 32-bit coin
+# is below cut, otherwise it yields alias; cuts are integers so SQL and the
+# NumPy engine agree exactly. Missing, negative or all-zero weights count as 0
+# (all zero falls back to uniform).
+alias_builder = """
+CREATE FUNCTION build_alias(p_weights numeric[])
+RETURNS TABLE(ord int, cut bigint, alias int) AS $$
+DECLARE
+n int := coalesce(cardinality(p_weights), 0);
+total numeric;
+p numeric[];
+cuts bigint[];
+aliases int[];
+small int[] := '{}';
+large int[] := '{}';
+s int;
+l int;
+BEGIN
+IF n = 0 THEN
+RETURN;
+END IF;
+SELECT sum(greatest(coalesce(w, 0), 0)) INTO total FROM unnest(p_weights) AS w;
+FOR i IN 1..n LOOP
+p[i] := CASE WHEN total > 0 THEN greatest(coalesce(p_weights[i], 0), 0) * n / total ELSE 1 END;
+cuts[i] := 4294967296;
+aliases[i] := i - 1;
+IF p[i] < 1 THEN
+small := small || i;
+ELSE
+large := large || i;
+END IF;
+END LOOP;
+WHILE cardinality(small) > 0 AND cardinality(large) > 0 LOOP
+s := small[cardinality(small)];
+small := small[1:cardinality(small) - 1];
+l := large[cardinality(large)];
+large := large[1:cardinality(large) - 1];
+cuts[s] := floor(p[s] * 4294967296);
+aliases[s] := l - 1;
+p[l] := (p[l] + p[s]) - 1;
+IF p[l] < 1 THEN
+small := small || l;
+ELSE
+large := large || l;
+END IF;
+END LOOP;
+RETURN QUERY SELECT i - 1, cuts[i], aliases[i] FROM generate_series(1, n) AS i;
+END;
+$$ LANGUAGE plpgsql IMMUTABLE;
+"""
+
+# Shared (NULL locale) phone patterns take ordinals 0..k-1 and each locale's own
+# patterns continue from k, so every locale sees a dense 0..n-1 range
+ordinals = """
+CREATE FUNCTION refresh_lookup_ordinals()
+RETURNS void AS $$
+BEGIN
+CREATE TABLE IF NOT EXISTS lookup_counts(
+tbl text,
+locale text,
+part text,
+n int,
+PRIMARY KEY (tbl, locale, part));
+TRUNCATE lookup_counts;
+CREATE TABLE IF NOT EXISTS lookup_alias(
+tbl text,
+locale text,
+ord int,
+cut bigint,
+alias int,
+PRIMARY KEY (tbl, locale, ord));
+TRUNCATE lookup_alias;
+-- Bumped on every refresh so page caches know the lookup data changed
+CREATE TABLE IF NOT EXISTS lookup_version(version bigint NOT NULL);
+INSERT INTO lookup_version SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM lookup_version);
+UPDATE lookup_version SET version = version + 1;
+""" + "".join(numbering_sql(*spec) for spec in ordinal_tables) \
+  + "".join(alias_sql(*spec) for spec in alias_tables) + """
+ALTER TABLE phone_number_patterns ADD COLUMN IF NOT EXISTS ord int;
+DROP INDEX IF EXISTS phone_number_patterns_ord_idx;
+UPDATE phone_number_patterns AS t SET ord = o.ord
+FROM (SELECT id, row_number() OVER (PARTITION BY locale ORDER BY id) - 1
++ CASE WHEN locale IS NULL THEN 0 ELSE (SELECT count(*) FROM phone_number_patterns WHERE locale IS NULL) END AS ord
+FROM phone_number_patterns) AS o
+WHERE o.id = t.id AND t.ord IS DISTINCT FROM o.ord;
+CREATE UNIQUE INDEX IF NOT EXISTS phone_number_patterns_ord_idx ON phone_number_patterns (ord, locale);
+INSERT INTO lookup_counts
+SELECT 'phone_number_patterns', l.locale, '', count(p.id)
+FROM (SELECT DISTINCT locale FROM names WHERE locale IS NOT NULL) AS l
+JOIN phone_number_patterns AS p ON p.locale = l.locale OR p.locale IS NULL
+GROUP BY l.locale;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+lookup_count = """
+CREATE FUNCTION lookup_count(p_table text, p_locale text, p_part text)
+RETURNS int AS $$
+SELECT n FROM lookup_counts WHERE tbl = p_table AND locale = p_locale AND part = p_part;
+$$ LANGUAGE sql STABLE;
+"""
+
+pick_hash = """
+CREATE FUNCTION pick_hash(p_seed int, p_batch int, p_index int)
+RETURNS bytea AS $$
+SELECT decode(md5(p_seed::text || ':' || p_batch::text || ':' || p_index::text)
+|| md5(p_seed::text || ':' || p_batch::text || ':' || p_index::text || '#1')
+|| md5(p_seed::text || ':' || p_batch::text || ':' || p_index::text || '#2'), 'hex');
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+alias_ord = """
+CREATE FUNCTION alias_ord(p_table text, p_locale text, p_seed int, p_batch int, p_index int,
+                          p_lane int, p_coin_lane int)
+RETURNS bigint AS $$
+DECLARE
+h bytea := pick_hash(p_seed, p_batch, p_index);
+col bigint;
+BEGIN
+col := hash_lane(h, p_lane) % lookup_count(p_table, p_locale, '');
+RETURN (
+SELECT CASE WHEN hash_lane(h, p_coin_lane) < a.cut THEN a.ord ELSE a.alias END
+FROM lookup_alias AS a
+WHERE a.tbl = p_table AND a.locale = p_locale AND a.ord = col
+);
 END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
+hash_lane = """
+CREATE FUNCTION hash_lane(p_hash bytea, p_lane int)
+RETURNS bigint AS $$
+SELECT (get_byte(p_hash, p_lane * 4)::bigint << 24) | (get_byte(p_hash, p_lane * 4 + 1) << 16)
+| (get_byte(p_hash, p_lane * 4 + 2) << 8) | get_byte(p_hash, p_lane * 4 + 3);
+$$ LANGUAGE sql IMMUTABLE;
+"""
 
+pick_ord = """
+CREATE FUNCTION pick_ord(p_table text, p_locale text, p_part text, p_seed int, p_batch int, p_index int, p_lane int)
+RETURNS bigint AS $$
+BEGIN
+RETURN hash_lane(pick_hash(p_seed, p_batch, p_index), p_lane) % lookup_count(p_table, p_locale, p_part);
+END;
+$$ LANGUAGE plpgsql STABLE;
+"""
 
 # Generator
 generator = """
-CREATE FUNCTION generate_fake_user(p_locale text, p_seed int, p_batch int, p_index int)
+CREATE FUNCTION generate_fake_user(p_locale text, p_seed int, p_batch int, p_index int, p_version int DEFAULT 1)
 RETURNS json AS $$
 DECLARE
 user_gender text;
@@ -228,11 +533,11 @@ u2 := (u1 + 0.5) - floor(u1 + 0.5);
 -- get gender and names
 user_gender := get_gender(p_seed, p_batch, p_index);
 SELECT n.fname, n.lname INTO first_name, last_name
-FROM get_name(p_locale, user_gender, p_seed, p_batch, p_index) AS n;
+FROM get_name(p_locale, user_gender, p_seed, p_batch, p_index, p_version) AS n;
 
 -- other attributes
-title := pick_title(p_locale, user_gender, p_seed, p_batch, p_index);
-region_data := pick_region(p_locale, p_seed, p_batch, p_index);
+title := pick_title(p_locale, user_gender, p_seed, p_batch, p_index, p_version);
+region_data := pick_region(p_locale, p_seed, p_batch, p_index, p_version);
 region_name:=  CASE 
 WHEN p_locale = 'de_DE' THEN region_data->>'city'
 ELSE region_data->>'state'  
@@ -242,19 +547,19 @@ CASE
 WHEN p_locale = 'de_DE' THEN region_data->>'city'
 ELSE region_data->>'state'
 END,
-p_seed, p_batch, p_index
+p_seed, p_batch, p_index, p_version
 );
-eye_color := get_eye_color(p_locale, p_seed, p_batch, p_index);
+eye_color := get_eye_color(p_locale, p_seed, p_batch, p_index, p_version);
 
 SELECT pa.height, pa.weight INTO height_mean, weight_mean
 FROM physical_attributes AS pa
 WHERE pa.gender = user_gender AND pa.locale = p_locale;
 
-email_domain := get_email_domain(p_locale, p_seed, p_batch, p_index);
-email_pattern := get_email_pattern(p_seed, p_batch, p_index);
-phone_pattern := get_phone_pattern(p_locale, p_seed, p_batch, p_index);
-suffix := address_suf(p_locale, p_seed, p_batch, p_index);
-word := get_word(p_locale, p_seed, p_batch, p_index);
+email_domain := get_email_domain(p_locale, p_seed, p_batch, p_index, p_version);
+email_pattern := get_email_pattern(p_seed, p_batch, p_index, p_version);
+phone_pattern := get_phone_pattern(p_locale, p_seed, p_batch, p_index, p_version);
+suffix := address_suf(p_locale, p_seed, p_batch, p_index, p_version);
+word := get_word(p_locale, p_seed, p_batch, p_index, p_version);
 
 -- full name
 IF r > 0.6 THEN
@@ -316,22 +621,160 @@ END;
 $$ LANGUAGE plpgsql STABLE;
 """
 
+# Set-based generator: a whole range of indexes in one query. Version 1 returns
+# exactly what generate_fake_user returns; version 2 returns what
+# generate_fake_user(..., 2) returns, joining every user to its lookup rows by
+# ordinal instead of going through the pickers one attribute at a time.
+batch_generator = """
+CREATE FUNCTION generate_fake_users(p_locale text, p_seed int, p_batch int, p_start int, p_count int,
+                                    p_version int DEFAULT 1)
+RETURNS TABLE(idx int, fake_user json) AS $$
+BEGIN
+IF p_version = 1 THEN
+RETURN QUERY
+SELECT gs, generate_fake_user(p_locale, p_seed, p_batch, gs)
+FROM generate_series(p_start, p_start + p_count - 1) AS gs;
+RETURN;
+END IF;
+
+RETURN QUERY
+WITH u AS MATERIALIZED (
+SELECT gs AS i,
+get_gender(p_seed, p_batch, gs) AS gender,
+det_rand(p_locale, p_seed, p_batch, gs) AS r,
+pick_hash(p_seed, p_batch, gs) AS h
+FROM generate_series(p_start, p_start + p_count - 1) AS gs
+),
+c AS MATERIALIZED (
+SELECT lookup_count('regions', p_locale, '') AS regions,
+lookup_count('eye_colors', p_locale, '') AS eye_colors,
+lookup_count('email_domains', p_locale, '') AS email_domains,
+lookup_count('email_patterns', '', '') AS email_patterns,
+lookup_count('phone_number_patterns', p_locale, '') AS phone_patterns,
+lookup_count('suffixes', p_locale, '') AS suffixes,
+lookup_count('words', p_locale, '') AS words
+),
+p AS MATERIALIZED (
+SELECT u.i, u.gender, u.r, u.h,
+LEAST(GREATEST(u.r, 1e-10), 1-1e-10) AS u1,
+hash_lane(u.h, 0) % nc.n AS name_ord,
+hash_lane(u.h, 1) % tc.n AS title_ord,
+hash_lane(u.h, 2) % c.regions AS region_ord,
+CASE WHEN hash_lane(u.h, 10) < ea.cut THEN ea.ord ELSE ea.alias END AS eye_ord,
+CASE WHEN hash_lane(u.h, 11) < da.cut THEN da.ord ELSE da.alias END AS domain_ord,
+hash_lane(u.h, 6) % c.email_patterns AS email_pattern_ord,
+hash_lane(u.h, 7) % c.phone_patterns AS phone_pattern_ord,
+hash_lane(u.h, 8) % c.suffixes AS suffix_ord,
+hash_lane(u.h, 9) % c.words AS word_ord
+FROM u
+CROSS JOIN c
+LEFT JOIN lookup_counts AS nc ON nc.tbl = 'names' AND nc.locale = p_locale AND nc.part = u.gender
+LEFT JOIN lookup_counts AS tc ON tc.tbl = 'titles' AND tc.locale = p_locale AND tc.part = u.gender
+LEFT JOIN lookup_alias AS ea ON ea.tbl = 'eye_colors' AND ea.locale = p_locale
+AND ea.ord = hash_lane(u.h, 4) % c.eye_colors
+LEFT JOIN lookup_alias AS da ON da.tbl = 'email_domains' AND da.locale = p_locale
+AND da.ord = hash_lane(u.h, 5) % c.email_domains
+),
+rg AS (
+SELECT p.i, r.data, CASE WHEN p_locale = 'de_DE' THEN r.data->>'city' ELSE r.data->>'state' END AS region_name
+FROM p JOIN regions AS r ON r.locale = p_locale AND r.ord = p.region_ord
+),
+geo AS (
+SELECT rg.i, g.data
+FROM rg
+JOIN p ON p.i = rg.i
+JOIN lookup_counts AS gc ON gc.tbl = 'geo_location' AND gc.locale = '' AND gc.part = rg.region_name
+JOIN geo_location AS g ON g.data->>'region' = rg.region_name AND g.ord = hash_lane(p.h, 3) % gc.n
+),
+v AS (
+SELECT p.i, p.gender, p.r, p.u1, (p.u1 + 0.5) - floor(p.u1 + 0.5) AS u2,
+nm.first_name, nm.last_name, ti.title, rg.data AS region_data, rg.region_name, geo.data AS location_data,
+ey.eye_color, pa.height AS height_mean, pa.weight AS weight_mean,
+dm.domain AS email_domain, ep.pattern AS email_pattern, pp.pattern AS phone_pattern,
+sf.suffix, wd.word
+FROM p
+LEFT JOIN names AS nm ON nm.locale = p_locale AND nm.gender = p.gender AND nm.ord = p.name_ord
+LEFT JOIN titles AS ti ON ti.locale = p_locale AND ti.gender = p.gender AND ti.ord = p.title_ord
+LEFT JOIN rg ON rg.i = p.i
+LEFT JOIN geo ON geo.i = p.i
+LEFT JOIN eye_colors AS ey ON ey.locale = p_locale AND ey.ord = p.eye_ord
+LEFT JOIN physical_attributes AS pa ON pa.gender = p.gender AND pa.locale = p_locale
+LEFT JOIN email_domains AS dm ON dm.locale = p_locale AND dm.ord = p.domain_ord
+LEFT JOIN email_patterns AS ep ON ep.ord = p.email_pattern_ord
+LEFT JOIN phone_number_patterns AS pp ON (pp.locale = p_locale OR pp.locale IS NULL) AND pp.ord = p.phone_pattern_ord
+LEFT JOIN suffixes AS sf ON sf.locale = p_locale AND sf.ord = p.suffix_ord
+LEFT JOIN words AS wd ON wd.locale = p_locale AND wd.ord = p.word_ord
+)
+SELECT v.i, json_build_object(
+'full_name', CASE WHEN v.r > 0.6 THEN v.title || ' ' || v.first_name || ' ' || v.last_name
+ELSE v.first_name || ' ' || v.last_name END,
+'gender', v.gender,
+'eye_color', v.eye_color,
+'height', round(greatest(v.height_mean + 5 * sqrt(-2 * ln(v.u1)) * cos(2 * pi() * v.u2),160))::numeric,
+'weight', round(greatest(v.weight_mean + CASE WHEN p_locale = 'en_US' THEN 13 ELSE 9 END * sqrt(-2 * ln(v.u1)) * cos(2 * pi() * v.u2),50))::numeric,
+'email', replace(replace(replace(replace(replace(replace(v.email_pattern,
+'{first}', v.first_name),
+'{last}', v.last_name),
+'{f}', left(v.first_name,1)),
+'{l}', left(v.last_name,1)),
+'{domain}', v.email_domain),
+'{random}', lpad(floor(v.r * 1000)::text, 3, '0')),
+'phone', replace(replace(replace(v.phone_pattern,
+'{intl}', CASE WHEN p_locale = 'en_US' THEN '+1' ELSE '+49' END),
+'{area}', v.region_data->>'area_code'),
+'{subscriber}', lpad(floor(v.u2 * 1000000)::text, 6, '0')),
+'address', v.word || ' ' || v.suffix || ', ' || (v.region_data->>'zip_prefix') || '-' ||
+CASE WHEN p_locale = 'en_US' THEN lpad(floor(v.u1 * 1000)::text, 3, '0')
+ELSE lpad(floor(v.u1 * 10000)::text, 4, '0') END,
+'lat', round(((v.location_data->>'lat_min')::numeric + v.r * ((v.location_data->>'lat_max')::numeric - (v.location_data->>'lat_min')::numeric))::numeric, 6),
+'lon', round(((v.location_data->>'lon_min')::numeric + v.r * ((v.location_data->>'lon_max')::numeric - (v.location_data->>'lon_min')::numeric))::numeric, 6),
+'region', v.region_name
+)
+FROM v
+ORDER BY v.i;
+END;
+$$ LANGUAGE plpgsql STABLE
+-- the join plan barely depends on the arguments, so skip re-planning per call
+SET plan_cache_mode = force_generic_plan;
+"""
+
 conn.rollback()  # reset any aborted transaction
 
+# Older signatures stay listed so existing databases are cleaned up too
 drop_functions = [
+    "generate_fake_users(text, int, int, int, int, int)",
+    "generate_fake_user(text, int, int, int, int)",
     "generate_fake_user(text, int, int, int)",
+    "get_name(text, text, int, int, int, int)",
     "get_name(text, text, int, int, int)",
+    "get_eye_color(text, int, int, int, int)",
     "get_eye_color(text, int, int, int)",
+    "get_email_domain(text, int, int, int, int)",
     "get_email_domain(text, int, int, int)",
     "get_gender(int, int, int)",
+    "pick_title(text, text, int, int, int, int)",
     "pick_title(text, text, int, int, int)",
+    "pick_region(text, int, int, int, int)",
     "pick_region(text, int, int, int)",
+    "get_location(text, int, int, int, int)",
     "get_location(text, int, int, int)",
     "det_rand(text, int, int, int)",
+    "get_email_pattern(int, int, int, int)",
     "get_email_pattern(int, int, int)",
+    "get_phone_pattern(text, int, int, int, int)",
     "get_phone_pattern(text, int, int, int)",
+    "address_suf(text, int, int, int, int)",
     "address_suf(text, int, int, int)",
-    "get_word(text, int, int, int)"
+    "get_word(text, int, int, int, int)",
+    "get_word(text, int, int, int)",
+    "pick_ord(text, text, text, int, int, int, int)",
+    "pick_hash(int, int, int)",
+    "pick_hash(text, int, int, int)",
+    "hash_lane(bytea, int)",
+    "lookup_count(text, text, text)",
+    "alias_ord(text, text, int, int, int, int, int)",
+    "refresh_lookup_ordinals()",
+    "build_alias(numeric[])"
 ]
 
 cur.execute("BEGIN;")
@@ -341,12 +784,18 @@ cur.execute("COMMIT;")
 
 
 
+# SQL-language functions are checked at creation, so lookup_counts has to be
+# filled before lookup_count and pick_ord are created
 sql_functions = [get_gender, name, title, region, location, det_random,word,
-                 eye, email_domain, email_pattern, phone_pattern, address_suffix, generator
+                 eye, email_domain, email_pattern, phone_pattern, address_suffix,
+                 lookup_count, pick_hash, hash_lane, pick_ord, alias_ord, generator, batch_generator
                  ]
 
 try:
     cur.execute("Begin;")
+    cur.execute(alias_builder)
+    cur.execute(ordinals)
+    cur.execute("SELECT refresh_lookup_ordinals();")
     for sql in sql_functions:
         cur.execute(sql)
     cur.execute("Commit;")
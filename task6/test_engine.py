@@ -0,0 +1,31 @@
+import os
+import psycopg2
+import pytest
+from dotenv import load_dotenv
+import db
+import engine
+
+# Parity of the numpy engine with generate_fake_users(..., 2); needs a loaded
+# database, e.g. DATABASE_URL=postgresql://postgres@localhost:5432/fake pytest
+
+load_dotenv()
+pytestmark = pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL is not set")
+
+
+@pytest.fixture(scope="module")
+def conn():
+    conn = psycopg2.connect(**db.connect_args())
+    yield conn
+    conn.close()
+
+
+@pytest.fixture(scope="module")
+def tables(conn):
+    return engine.LookupTables.from_db(conn)
+
+
+@pytest.mark.parametrize("locale", ["en_US", "de_DE"])
+@pytest.mark.parametrize("seed, batch, start", [(1, 1, 0), (42, 7, 0), (-5, 1000, 0), (123456789, 3, 5000)])
+def test_engine_matches_sql(conn, tables, locale, seed, batch, start):
+    assert locale in tables.locales
+    assert engine.parity(conn, tables, locale, seed, batch, start, 2000) == []